@@ -1,28 +1,170 @@
-from typing import Dict, Any, List
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Sequence
+from uuid import UUID
 from langchain.callbacks.base import BaseCallbackHandler
 from langchain.schema import LLMResult
+from langchain_core.documents import Document
+from src.common.metrics import (
+    current_stage,
+    llm_request_duration,
+    llm_tokens,
+    stage_duration,
+)
+
+
+@dataclass
+class _LLMRun:
+    """State of an LLM request in flight.
+    Attributes:
+        start (float): Start time (`time.perf_counter`).
+        stage (str): Pipeline stage that sent the request.
+        sampled (bool): Whether the prompt and response are logged.
+        streamed_tokens (int): Tokens received so far when streaming.
+    """
+
+    start: float
+    stage: str
+    sampled: bool
+    streamed_tokens: int = 0
 
 
 class AgentCallbackHandler(BaseCallbackHandler):
-    """Callback handler for the agent."""
+    """Callback handler for the agent, it records the latency and token usage of the
+    LLM requests (by pipeline stage, see `src.common.metrics.span`) and the latency
+    of the retrievals in the metrics exposed by `/metrics`. The whole prompt and
+    response of a sample of the LLM requests are logged (`LLM_DEBUG_SAMPLE_RATE`).
+    Attributes:
+        logger (logging.Logger): Logger of the sampled prompts and responses.
+        debug_sample_rate (float): Share of the LLM requests logged, 0 to disable.
+    """
+
+    # Only in-memory bookkeeping, run in the calling task instead of an executor thread
+    run_inline = True
+
+    def __init__(
+        self, logger: Optional[logging.Logger] = None, debug_sample_rate: float = 0.0
+    ):
+        self.logger = logger or logging.getLogger(__name__)
+        self.debug_sample_rate = debug_sample_rate
+        self._llm_runs: Dict[UUID, _LLMRun] = {}
+        self._retriever_runs: Dict[UUID, float] = {}
 
     def on_llm_start(
-        self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any
+        self,
+        serialized: Dict[str, Any],
+        prompts: List[str],
+        *,
+        run_id: UUID,
+        **kwargs: Any,
     ) -> Any:
         """Run when LLM starts running.
         Args:
             serialized (Dict[str, Any]): Serialized data.
             prompts (List[str]): List of prompts.
+            run_id (UUID): Run identifier.
         """
-        print("---------")
-        print(f"***Prompt to LLM was:***\n{prompts[0]}")
-        print("---------")
+        run = _LLMRun(
+            start=time.perf_counter(),
+            stage=current_stage.get(),
+            sampled=random.random() < self.debug_sample_rate,
+        )
+        self._llm_runs[run_id] = run
+        if run.sampled:
+            self.logger.info(
+                f"Prompt to LLM ({run.stage}, run {run_id}):\n{prompts[0]}"
+            )
 
-    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> Any:
-        """Run when LLM ends running.
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> Any:
+        """Run on each new token when streaming.
+        Args:
+            token (str): New token.
+            run_id (UUID): Run identifier.
+        """
+        run = self._llm_runs.get(run_id)
+        if run is not None and token:
+            run.streamed_tokens += 1
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> Any:
+        """Run when LLM ends running. Cached responses report no token usage, the
+        completion tokens of a streamed response are counted as they arrive.
         Args:
             response (LLMResult): LLM response.
+            run_id (UUID): Run identifier.
+        """
+        run = self._llm_runs.pop(run_id, None)
+        if run is None:
+            return
+        llm_request_duration.labels(stage=run.stage).observe(
+            time.perf_counter() - run.start
+        )
+
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = token_usage.get("prompt_tokens", 0)
+        completion_tokens = token_usage.get("completion_tokens", run.streamed_tokens)
+        if prompt_tokens:
+            llm_tokens.labels(stage=run.stage, type="prompt").inc(prompt_tokens)
+        if completion_tokens:
+            llm_tokens.labels(stage=run.stage, type="completion").inc(
+                completion_tokens
+            )
+
+        if run.sampled:
+            self.logger.info(
+                f"LLM Response ({run.stage}, run {run_id}):\n"
+                f"{response.generations[0][0].text}"
+            )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> Any:
+        """Run when LLM errors.
+        Args:
+            error (BaseException): Error raised.
+            run_id (UUID): Run identifier.
+        """
+        self._llm_runs.pop(run_id, None)
+
+    def on_retriever_start(
+        self,
+        serialized: Dict[str, Any],
+        query: str,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """Run when a retriever starts running, the fallback retriever called by
+        another one is timed as part of it.
+        Args:
+            serialized (Dict[str, Any]): Serialized data.
+            query (str): Query.
+            run_id (UUID): Run identifier.
+            parent_run_id (Optional[UUID], optional): Parent run identifier.
+            Defaults to None.
+        """
+        if parent_run_id not in self._retriever_runs:
+            self._retriever_runs[run_id] = time.perf_counter()
+
+    def on_retriever_end(
+        self, documents: Sequence[Document], *, run_id: UUID, **kwargs: Any
+    ) -> Any:
+        """Run when a retriever ends running.
+        Args:
+            documents (Sequence[Document]): Retrieved documents.
+            run_id (UUID): Run identifier.
+        """
+        start = self._retriever_runs.pop(run_id, None)
+        if start is not None:
+            elapsed = time.perf_counter() - start
+            stage_duration.labels(stage="retrieval").observe(elapsed)
+
+    def on_retriever_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> Any:
+        """Run when a retriever errors.
+        Args:
+            error (BaseException): Error raised.
+            run_id (UUID): Run identifier.
         """
-        print("---------")
-        print(f"***LLM Response:***\n{response.generations[0][0].text}")
-        print("---------")
+        self._retriever_runs.pop(run_id, None)
@@ -1,24 +1,68 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from tools.tools import pokemon_api_wrapper
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableSequence
+from langchain_core.tools import BaseTool
 from langchain_core.utils.function_calling import convert_to_openai_function
 from parsers.info_output_parser import PokemonEntityList
 from parsers.tooling_output_parser import tooling_parser
+from src.common.metrics import traced
 from textwrap import dedent
 from setup_loader import SetupLoader
 
 app_setup = SetupLoader()
-base_llm, logger, prompt_template_library = (
+base_llm, logger, global_conf, prompt_template_library = (
     app_setup.chat_openai,
     app_setup.logger,
+    app_setup.global_conf,
     app_setup.prompt_template_library,
 )
 
 
+tools = [pokemon_api_wrapper]  # Default structure to add more tools
+tool_map = {tool.name: tool for tool in tools}
+
+
+def _get_direct_tool(pokemon_names: List[str]) -> Optional[BaseTool]:
+    """Select the tool without the LLM when the choice is unambiguous, that is when a
+    single tool is available and the Pokémon names were already extracted.
+    Args:
+        pokemon_names (List[str]): Pokémon names to request.
+    Returns:
+        Optional[BaseTool]: Tool to call directly, or None if the LLM must select it.
+    """
+    if global_conf["TOOL_DIRECT_DISPATCH"] and len(tools) == 1 and pokemon_names:
+        return tools[0]
+    return None
+
+
+def _get_tooling_chain(prompt: str) -> RunnableSequence:
+    """Create the chain that selects the tool to use and its input.
+    Args:
+        prompt (str): Prompt to use.
+    Returns:
+        RunnableSequence: Tool selection chain.
+    """
+    tooling_template = dedent(prompt_template_library[prompt])
+
+    functions = [convert_to_openai_function(t) for t in tools]
+
+    model = base_llm.bind(functions=functions)
+    tooling_prompt_template = ChatPromptTemplate.from_messages(
+        [("system", tooling_template), ("human", "{input}")]
+    )
+    chain = tooling_prompt_template | model | tooling_parser
+
+    return chain
+
+
+@traced("api_tool")
 def api_retrieval_agent(
     pokemon_entity_list: PokemonEntityList, prompt: str = None
 ) -> List[Dict[str, Any]]:
     """Use the API retrieval agent to request information about Pokémon entities.
+    The tool is dispatched directly when the selection is unambiguous, otherwise the
+    LLM selects it (`TOOL_DIRECT_DISPATCH`).
     Args:
         pokemon_entity_list (PokemonEntityList): List of Pokémon entities.
         prompt (str, optional): Prompt to use. Defaults to None.
@@ -26,23 +70,57 @@ def api_retrieval_agent(
         List[Dict[str, Any]]: List of dictionaries with the information of the Pokémon
         entities.
     """
-    tooling_template = dedent(prompt_template_library[prompt])
+    pokemon_names = [str(pokemon.name) for pokemon in pokemon_entity_list.name_list]
+
+    direct_tool = _get_direct_tool(pokemon_names)
+    if direct_tool is not None:
+        try:
+            return direct_tool.invoke({"name_list": pokemon_names})
+        except Exception as e:
+            logger.warning(f"Tool Error Recovering Output: {e}")
+            return {}
+
+    tooling_result = _get_tooling_chain(prompt).invoke({"input": pokemon_names})
 
+    try:
+        selected_tool = tool_map[tooling_result.tool]
+        result = selected_tool(tooling_result.tool_input)
+    except Exception as e:
+        result = {}
+        logger.warning(f"Tool Error Recovering Output: {e}")
+
+    return result
+
+
+@traced("api_tool")
+async def aapi_retrieval_agent(
+    pokemon_entity_list: PokemonEntityList, prompt: str = None
+) -> List[Dict[str, Any]]:
+    """Asynchronous version of `api_retrieval_agent`.
+    Args:
+        pokemon_entity_list (PokemonEntityList): List of Pokémon entities.
+        prompt (str, optional): Prompt to use. Defaults to None.
+    Returns:
+        List[Dict[str, Any]]: List of dictionaries with the information of the Pokémon
+        entities.
+    """
     pokemon_names = [str(pokemon.name) for pokemon in pokemon_entity_list.name_list]
-    tools = [pokemon_api_wrapper]  # Default structure to add more tools
-    tool_map = {tool.name: tool for tool in tools}
-    functions = [convert_to_openai_function(t) for t in tools]
 
-    model = base_llm.bind(functions=functions)
-    tooling_prompt_template = ChatPromptTemplate.from_messages(
-        [("system", tooling_template), ("human", "{input}")]
+    direct_tool = _get_direct_tool(pokemon_names)
+    if direct_tool is not None:
+        try:
+            return await direct_tool.ainvoke({"name_list": pokemon_names})
+        except Exception as e:
+            logger.warning(f"Tool Error Recovering Output: {e}")
+            return {}
+
+    tooling_result = await _get_tooling_chain(prompt).ainvoke(
+        {"input": pokemon_names}
     )
-    chain = tooling_prompt_template | model | tooling_parser
-    tooling_result = chain.invoke({"input": pokemon_names})
 
     try:
         selected_tool = tool_map[tooling_result.tool]
-        result = selected_tool(tooling_result.tool_input)
+        result = await selected_tool.ainvoke(tooling_result.tool_input)
     except Exception as e:
         result = {}
         logger.warning(f"Tool Error Recovering Output: {e}")
@@ -1,5 +1,10 @@
 from langchain_core.prompts import ChatPromptTemplate
-from parsers.intent_output_parser import intent_parser, IntentTagger
+from parsers.intent_output_parser import (
+    intent_parser,
+    IntentTagger,
+    intent_entity_parser,
+    IntentEntityTagger,
+)
 from langchain.schema.output_parser import StrOutputParser
 from textwrap import dedent
 from langchain_community.utils.openai_functions import (
@@ -60,6 +65,29 @@ def get_pokemon_entity_chain() -> RunnableSequence:
     return pokemon_entity_template | model | pokemon_entity_parser
 
 
+def get_intent_entity_chain() -> RunnableSequence:
+    """Create a chain that identifies the intent type and structure, and the Pokémon
+    entities of a user input in a single call, by fusing the Tagging and Extraction
+    approaches into one function.
+    Returns:
+        RunnableSequence: Language model chain structured as RunnableSequence.
+    """
+    intent_entity_template = dedent(
+        prompt_template_library["stage_0_1_intent_entity_template"]
+    )
+
+    intent_entity_prompt_template = ChatPromptTemplate.from_messages(
+        [("system", intent_entity_template), ("human", "{input}")]
+    )
+
+    model = base_llm.bind(
+        functions=[convert_pydantic_to_openai_function(IntentEntityTagger)],
+        function_call={"name": "IntentEntityTagger"},
+    )
+
+    return intent_entity_prompt_template | model | intent_entity_parser
+
+
 def get_no_intent_chain() -> RunnableSequence:
     """Create a chain that can be used to handle the case where no intent is
     identified. Respond with generic GPT model knowledge.
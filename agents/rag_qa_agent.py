@@ -1,8 +1,7 @@
-from typing import Dict, Any, List
+from typing import AsyncIterator, Dict, Any, List
 import re
 from textwrap import dedent
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
+from langchain_core.retrievers import BaseRetriever
 from langchain_core.runnables import RunnablePassthrough, RunnableParallel
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import (
@@ -11,6 +10,10 @@ from langchain_core.prompts import (
     PromptTemplate,
 )
 from parsers.info_output_parser import PokemonEntity
+from retrieval_system.context_packer import pack_context
+from retrieval_system.retriever_registry import RetrieverRegistry
+from src.common.metrics import span, traced
+from tools.type_chart import damage_relations as get_damage_relations
 
 from setup_loader import SetupLoader
 
@@ -23,23 +26,56 @@ base_llm, logger, global_conf, prompt_template_library = (
 )
 
 
-def format_docs(docs: Any) -> str:
-    return "\n\n".join(doc.page_content for doc in docs)
+def format_docs(docs: Any, qa_prompt: str = None) -> str:
+    """Pack the retrieved documents into the prompt context, merging overlapping
+    chunks and trimming it to the token budget of the QA prompt
+    (`RAG_CONTEXT_TOKEN_BUDGET`).
+    Args:
+        docs (Any): Retrieved documents.
+        qa_prompt (str, optional): QA prompt to be used. Defaults to None.
+    Returns:
+        str: Context.
+    """
+    token_budget = global_conf["RAG_CONTEXT_TOKEN_BUDGET"]
+    return pack_context(
+        docs=docs,
+        max_tokens=token_budget.get(qa_prompt, token_budget["default"]),
+        model=global_conf["MODEL_NAME"],
+    )
+
+
+def _get_retrieval_qa_chain(
+    qa_prompt: str, name_lookup: bool = False
+) -> RunnableParallel:
+    """Get the chain that can be used to performa semantic queries over FAISS Vector
+    Store. The vector store is loaded once per process and the chain is built once per
+    `qa_prompt`, both are shared by the `RetrieverRegistry`.
+    Args:
+        qa_prompt (str): QA prompt to be used.
+        name_lookup (bool, optional): Read the entries of the Pokémon named in the
+        query from the name index, only for the description lookups of a named
+        Pokémon (`RAG_NAME_LOOKUP`). Defaults to False.
+    Returns:
+        RunnableParallel: Language model chain structured as RunnableParallel.
+    """
+    return RetrieverRegistry().get_chain(
+        qa_prompt=qa_prompt,
+        chain_builder=_build_retrieval_qa_chain,
+        name_lookup=name_lookup,
+    )
 
 
-def _get_retrieval_qa_chain(qa_prompt: str) -> RunnableParallel:
+def _build_retrieval_qa_chain(
+    retriever: BaseRetriever, qa_prompt: str
+) -> RunnableParallel:
     """Create a chain that can be used to performa semantic queries over FAISS Vector
     Store.
     Args:
+        retriever (BaseRetriever): Retriever of the FAISS Vector Store.
         qa_prompt (str): QA prompt to be used.
     Returns:
         RunnableParallel: Language model chain structured as RunnableParallel.
     """
-    new_vectorstore = FAISS.load_local(
-        folder_path=f"{global_conf['VECTOR_STORE_PATH']}/pokedex_index_react",
-        embeddings=OpenAIEmbeddings(),
-    )
-    retriever = new_vectorstore.as_retriever()
     prompt = ChatPromptTemplate(
         input_variables=["context", "question"],
         messages=[
@@ -53,19 +89,37 @@ def _get_retrieval_qa_chain(qa_prompt: str) -> RunnableParallel:
     )
 
     rag_chain = (
-        RunnablePassthrough.assign(context=(lambda x: format_docs(x["context"])))
+        RunnablePassthrough.assign(
+            context=(lambda x: format_docs(x["context"], qa_prompt=qa_prompt))
+        )
         | prompt
         | base_llm
         | StrOutputParser()
     )
-    # Adding sources to return
+    # Adding sources to return, the retrievals are timed by the callback handler
     rag_chain_with_source = RunnableParallel(
-        {"context": retriever, "question": RunnablePassthrough()}
+        {
+            "context": retriever.with_config(callbacks=app_setup.callbacks),
+            "question": RunnablePassthrough(),
+        }
     ).assign(answer=rag_chain)
 
     return rag_chain_with_source
 
 
+def _get_pokemon_queries(user_query: str, pokemon_names: List[str]) -> List[str]:
+    """Format the user query template once per Pokémon.
+    Args:
+        user_query (str): User query template to be used.
+        pokemon_names (List[str]): Pokémon names.
+    Returns:
+        List[str]: One query per Pokémon, in the same order.
+    """
+    user_query = dedent(prompt_template_library[user_query])
+    return [user_query.format(pokemon_name=pokemon) for pokemon in pokemon_names]
+
+
+@traced("rag")
 def retrieval_qa_agent(
     user_query: str = None,
     qa_prompt: str = None,
@@ -73,6 +127,7 @@ def retrieval_qa_agent(
 ) -> Dict[str, Any]:
     """ -- RAG Generation technique --
     RetrievalQA chain handler to performa semantic queries over FAISS Vector Store.
+    The entries of each Pokémon are read from the name index when available.
     Args:
         user_query (str, optional): User query to be used. Defaults to None.
         qa_prompt (str, optional): QA prompt to be used. Defaults to None.
@@ -85,17 +140,96 @@ def retrieval_qa_agent(
         More information at:
         https://python.langchain.com/docs/use_cases/question_answering/quickstart
     """
-    outputs = {}
     pokemon_names = [str(pokemon.name) for pokemon in pokemon_list]
 
-    rag_chain_with_source = _get_retrieval_qa_chain(qa_prompt)
+    rag_chain_with_source = _get_retrieval_qa_chain(qa_prompt, name_lookup=True)
 
-    for pokemon in pokemon_names:
-        outputs[pokemon] = rag_chain_with_source.invoke(
-            dedent(prompt_template_library[user_query]).format(pokemon_name=pokemon)
-        )
+    # Lookups are sent concurrently, the output keeps the order of the Pokémon list
+    answers = rag_chain_with_source.batch(
+        _get_pokemon_queries(user_query, pokemon_names),
+        config={"max_concurrency": global_conf["RAG_MAX_CONCURRENCY"]},
+    )
+
+    return dict(zip(pokemon_names, answers))
 
-    return outputs
+
+@traced("rag")
+async def aretrieval_qa_agent(
+    user_query: str = None,
+    qa_prompt: str = None,
+    pokemon_list: List[PokemonEntity] = None,
+) -> Dict[str, Any]:
+    """ -- RAG Generation technique --
+    Asynchronous version of `retrieval_qa_agent`.
+    Args:
+        user_query (str, optional): User query to be used. Defaults to None.
+        qa_prompt (str, optional): QA prompt to be used. Defaults to None.
+        pokemon_list (List[PokemonEntity], optional): List of Pokémon entities.
+        Defaults to None.
+    Returns:
+        Dict[str, Any]: Dictionary containing the Pokémon entity and its description,
+        or the relevant answer for the given question.
+    """
+    pokemon_names = [str(pokemon.name) for pokemon in pokemon_list]
+
+    rag_chain_with_source = _get_retrieval_qa_chain(qa_prompt, name_lookup=True)
+
+    answers = await rag_chain_with_source.abatch(
+        _get_pokemon_queries(user_query, pokemon_names),
+        config={"max_concurrency": global_conf["RAG_MAX_CONCURRENCY"]},
+    )
+
+    return dict(zip(pokemon_names, answers))
+
+
+@traced("rag")
+def qa_agent(query: str = None, qa_prompt: str = None) -> Dict[str, Any]:
+    """ -- RAG Generation technique --
+    Answer a query with the RetrievalQA chain.
+    Args:
+        query (str, optional): Query to be answered. Defaults to None.
+        qa_prompt (str, optional): QA prompt to be used. Defaults to None.
+    Returns:
+        Dict[str, Any]: Dictionary containing the retrieved context, the question
+        and the answer.
+    """
+    return _get_retrieval_qa_chain(qa_prompt).invoke(query)
+
+
+@traced("rag")
+async def aqa_agent(query: str = None, qa_prompt: str = None) -> Dict[str, Any]:
+    """ -- RAG Generation technique --
+    Asynchronous version of `qa_agent`.
+    Args:
+        query (str, optional): Query to be answered. Defaults to None.
+        qa_prompt (str, optional): QA prompt to be used. Defaults to None.
+    Returns:
+        Dict[str, Any]: Dictionary containing the retrieved context, the question
+        and the answer.
+    """
+    return await _get_retrieval_qa_chain(qa_prompt).ainvoke(query)
+
+
+async def astream_retrieval_qa_agent(
+    query: str = None, qa_prompt: str = None, name_lookup: bool = False
+) -> AsyncIterator[str]:
+    """ -- RAG Generation technique --
+    Streaming version of the RetrievalQA chain, the answer is yielded token by token
+    as the LLM generates it (the context is retrieved before the first token).
+    Args:
+        query (str, optional): Query to be answered. Defaults to None.
+        qa_prompt (str, optional): QA prompt to be used. Defaults to None.
+        name_lookup (bool, optional): Read the entries of the Pokémon named in the
+        query from the name index (description lookups). Defaults to False.
+    Returns:
+        AsyncIterator[str]: Tokens of the answer.
+    """
+    rag_chain_with_source = _get_retrieval_qa_chain(qa_prompt, name_lookup=name_lookup)
+
+    with span("rag"):
+        async for chunk in rag_chain_with_source.astream(query):
+            if "answer" in chunk:
+                yield chunk["answer"]
 
 
 def clean_string(s: str) -> str:
@@ -110,6 +244,7 @@ def clean_string(s: str) -> str:
     return cleaned
 
 
+@traced("rag")
 def defensive_qa_agent(
     user_query: str = None,
     qa_prompt: str = None,
@@ -135,8 +270,9 @@ def defensive_qa_agent(
     outputs = {}
 
     pokemon_list = [pokemon.name for pokemon in pokemon_list]
-    damage_relations = {
-        pokemon: pokemon_info[pokemon]["damage_relations"] for pokemon in pokemon_list
+    damage_relations = {  # Computed locally from all the types of the Pokémon
+        pokemon: get_damage_relations(pokemon_info[pokemon]["types"])
+        for pokemon in pokemon_list
     }
     user_query = dedent(prompt_template_library[user_query])
 
@@ -169,6 +305,65 @@ def defensive_qa_agent(
     return outputs
 
 
+@traced("rag")
+async def adefensive_qa_agent(
+    user_query: str = None,
+    qa_prompt: str = None,
+    pokemon_info: Dict[str, Any] = None,
+    pokemon_list: List[PokemonEntity] = None,
+) -> Dict[str, Any]:
+    """ -- RAG Generation technique --
+    Asynchronous version of `defensive_qa_agent`. The queries remain sequential since
+    every suggestion must exclude the Pokémon already retrieved.
+    Args:
+        user_query (str, optional): User query to be used. Defaults to None.
+        qa_prompt (str, optional): QA prompt to be used. Defaults to None.
+        pokemon_info (Dict[str, Any], optional): Dictionary containing the Pokémon
+        entity and its description. Defaults to None.
+        pokemon_list (List[PokemonEntity], optional): List of Pokémon entities.
+        Defaults to None.
+    Returns:
+        Dict[str, Any]: Dictionary containing the Pokémon entity and its description,
+        or the relevant answer for the given question.
+    """
+    outputs = {}
+
+    pokemon_list = [pokemon.name for pokemon in pokemon_list]
+    damage_relations = {  # Computed locally from all the types of the Pokémon
+        pokemon: get_damage_relations(pokemon_info[pokemon]["types"])
+        for pokemon in pokemon_list
+    }
+    user_query = dedent(prompt_template_library[user_query])
+
+    rag_chain_with_source = _get_retrieval_qa_chain(qa_prompt)
+
+    pokemon_retrieved = []
+    for pokemon in pokemon_list:
+        query = _format_damage_relation_query(
+            damage_relations=damage_relations,
+            pokemon=pokemon,
+            user_query=user_query,
+            pokemon_retrieved=pokemon_retrieved,
+        )
+        outputs[pokemon] = await rag_chain_with_source.ainvoke(dedent(query))
+        outputs[pokemon]["answer"] = clean_string(outputs[pokemon]["answer"])
+
+        if outputs[pokemon]["answer"] == "None":
+            query = _format_damage_relation_query(
+                damage_relations=damage_relations,
+                pokemon=pokemon,
+                user_query=user_query,
+                pokemon_retrieved=pokemon_retrieved,
+                empty_answer=True,
+            )
+            outputs[pokemon] = await rag_chain_with_source.ainvoke(dedent(query))
+            outputs[pokemon]["answer"] = clean_string(outputs[pokemon]["answer"])
+
+        pokemon_retrieved.append(outputs[pokemon]["answer"])
+
+    return outputs
+
+
 def _format_damage_relation_query(
     damage_relations: Dict,
     pokemon: str,
@@ -178,7 +373,8 @@ def _format_damage_relation_query(
 ) -> str:
     """Format the user query to request the damage relations of a Pokémon.
     Args:
-        damage_relations (Dict): Dictionary containing the damage relations of a Pokémon.
+        damage_relations (Dict): Dictionary containing the damage relations of a
+        Pokémon, each relation lists its type names.
         pokemon (str): Pokémon name.
         user_query (str): User query to be formatted.
         pokemon_retrieved (List[str]): List of Pokémon names that have been retrieved.
@@ -201,12 +397,13 @@ def _format_damage_relation_query(
         "no_damage_from": "\nMust NOT be a {no_damage_from} type.",
     }
 
-    seen_values = set()  # Filter out duplicated 'types'
-    filtered_damage_relations = {
-        key: value
-        for key, value in damage_relations.items()
-        if value not in seen_values and (seen_values.add(value) or True)
-    }
+    seen_types = set()  # Filter out duplicated 'types'
+    filtered_damage_relations = {}
+    for key, types in damage_relations.items():
+        types = [type_name for type_name in types if type_name not in seen_types]
+        seen_types.update(types)
+        if types:
+            filtered_damage_relations[key] = ", or ".join(types)
 
     if not empty_answer:  # When the answer is not empty, request all details
         for relation_type, message in relation_messages.items():
@@ -221,7 +418,9 @@ def _format_damage_relation_query(
     else:  # When the answer is empty, just request for the relevant Pokémon types
         priority_keys = ["double_damage_from", "no_damage_to"]
         filtered_damage_relations = {
-            k: damage_relations[k] for k in priority_keys if k in damage_relations
+            k: ", or ".join(damage_relations[k])
+            for k in priority_keys
+            if k in damage_relations
         }
 
         for key in filtered_damage_relations:
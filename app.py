@@ -1,8 +1,75 @@
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, Histogram, generate_latest
 from pydantic import BaseModel, Field
-from src.intent_handler import IntentHandler
+from src.common.metrics import LATENCY_BUCKETS, cache_collector
+from src.common.response_template import ResponseTemplate
+from src.common.semantic_cache import SemanticCache
+from src.intent_handler import (
+    IntentHandler,
+    load_pokemon_gazetteer,
+    pokemon_gazetteer,
+)
+from tools.pokeapi_client import pokeapi_client
+from setup_loader import SetupLoader
 
-app = FastAPI()
+app_setup = SetupLoader()
+logger, global_conf, embeddings = (
+    app_setup.logger,
+    app_setup.global_conf,
+    app_setup.embeddings,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Release the pooled PokeAPI connections on shutdown."""
+    yield
+    await pokeapi_client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def _build_semantic_cache() -> Optional[SemanticCache]:
+    """Create the semantic cache, matching the Pokémon names known locally (local
+    Pokédex store and name index of the vector store) in the queries, so a response
+    is never served to a query about another Pokémon.
+    Returns:
+        Optional[SemanticCache]: Semantic cache, None if disabled.
+    """
+    if not global_conf["SEMANTIC_CACHE_ENABLED"]:
+        return None
+    gazetteer = (
+        pokemon_gazetteer if pokemon_gazetteer is not None else load_pokemon_gazetteer()
+    )
+    return SemanticCache(
+        embeddings=embeddings,
+        threshold=global_conf["SEMANTIC_CACHE_THRESHOLD"],
+        ttl=global_conf["SEMANTIC_CACHE_TTL"],
+        max_entries=global_conf["SEMANTIC_CACHE_MAX_ENTRIES"],
+        extract_names=lambda query: (
+            entity.name for entity in gazetteer.extract(query).name_list
+        ),
+    )
+
+
+semantic_cache = _build_semantic_cache()
+
+request_duration = Histogram(
+    "pokemon_assistant_request_duration_seconds",
+    "Seconds to answer a request, by endpoint.",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+cache_collector.register_cache("pokeapi", pokeapi_client.cache_stats)
+if app_setup.llm_cache is not None:
+    cache_collector.register_cache("llm", app_setup.llm_cache.stats)
+if semantic_cache is not None:
+    cache_collector.register_cache("semantic", semantic_cache.stats)
 
 
 class Query(BaseModel):
@@ -11,6 +78,14 @@ class Query(BaseModel):
     user_query: str = Field(description="User query to process", default=None)
 
 
+class BatchQuery(BaseModel):
+    """Batch query model to handle many user queries in a single request"""
+
+    user_queries: List[str] = Field(
+        description="User queries to process", default_factory=list
+    )
+
+
 @app.post("/intent_query/")
 async def process_query(query: Query):
     """Endpoint to handle the intent execution and return the response to the
@@ -19,14 +94,135 @@ async def process_query(query: Query):
     agent in charge or the intent execution by using the `IntentHandler` class.\n
     Finally the response will be returned with the format defined by the
     `ResponseTemplate` object.\n
+    The pipeline is awaited (`IntentHandler.arun`), so a single worker can serve many
+    in-flight requests while they wait for the LLM or the Pokémon API.\n
+    Paraphrases of a recent query are answered from the semantic cache
+    (`SEMANTIC_CACHE_ENABLED`), failed responses are never cached.\n
     **Note**: The response will be in JSON format which will be used by the streamlit
     app to display the response.
     """
     try:
-        intent_handler = IntentHandler()
-        intent_handler.user_input = query.user_query
-        raw_response = intent_handler.run()
-        final_response = raw_response.template_structure
-        return {"response": final_response}
+        with request_duration.labels(endpoint="intent_query").time():
+            if semantic_cache is not None:
+                query_key, cached_response = await semantic_cache.alookup(
+                    query.user_query
+                )
+                if cached_response is not None:
+                    return {"response": cached_response}
+
+            intent_handler = IntentHandler()
+            intent_handler.user_input = query.user_query
+            raw_response = await intent_handler.arun()
+            final_response = raw_response.template_structure
+
+            if semantic_cache is not None and not raw_response.error:
+                semantic_cache.add(query_key, final_response)
+            return {"response": final_response}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+async def _stream_events(user_query: str) -> AsyncIterator[str]:
+    """Run the intent pipeline and serialize its streaming events as NDJSON lines,
+    cached responses are replayed as events.
+    Args:
+        user_query (str): User query to process.
+    Returns:
+        AsyncIterator[str]: One JSON event per line.
+    """
+    try:
+        with request_duration.labels(endpoint="intent_query_stream").time():
+            if semantic_cache is not None:
+                query_key, cached_response = await semantic_cache.alookup(
+                    user_query
+                )
+                if cached_response is not None:
+                    for event in ResponseTemplate.events(cached_response):
+                        yield json.dumps(event) + "\n"
+                    return
+
+            intent_handler = IntentHandler()
+            intent_handler.user_input = user_query
+            async for event in intent_handler.astream():
+                if (
+                    event["event"] == "done"
+                    and semantic_cache is not None
+                    and not intent_handler.response_template.error
+                ):
+                    semantic_cache.add(query_key, event["data"])
+                yield json.dumps(event) + "\n"
+    except Exception as e:
+        yield json.dumps({"event": "error", "data": str(e)}) + "\n"
+
+
+@app.post("/intent_query/stream")
+async def stream_query(query: Query):
+    """Streaming version of `/intent_query/`, the response is sent as newline
+    delimited JSON events while the pipeline runs (`IntentHandler.astream`), so the
+    header, each Pokémon card and the tokens of the RAG answers can be displayed as
+    soon as they are ready:\n
+    - `{"event": "header", "data": str}`: header, replaces the current one.\n
+    - `{"event": "card", "index": int, "data": {"name", "body", "sprites"}}`:
+    Pokémon card.\n
+    - `{"event": "token", "index": int | null, "data": str}`: token of a RAG answer,
+    appended to the card at `index`, or to the header when `index` is null.\n
+    - `{"event": "done", "data": dict}`: complete response, same format as
+    `/intent_query/`.\n
+    - `{"event": "error", "data": str}`: the pipeline failed.
+    """
+    return StreamingResponse(
+        _stream_events(query.user_query), media_type="application/x-ndjson"
+    )
+
+
+def _batch_response(raw_response: ResponseTemplate) -> Dict[str, Any]:
+    """Build the response of a query of a batch, a response that can't be built is
+    replaced by the error template so it doesn't fail the batch.
+    Args:
+        raw_response (ResponseTemplate): Response template of the query.
+    Returns:
+        Dict[str, Any]: Response template populated.
+    """
+    try:
+        return raw_response.template_structure
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        raw_response.error = True
+        return raw_response.template_structure
+
+
+@app.post("/intent_query/batch")
+async def process_batch(query: BatchQuery):
+    """Batch version of `/intent_query/` for offline jobs.\n
+    The queries are tagged and their Pokémon entities extracted with batched LLM
+    calls, and the API information and descriptions of each distinct Pokémon are
+    gathered once for the whole batch (`IntentHandler.abatch`).\n
+    A failed query is answered with the error template without failing the batch.
+    The semantic cache is not used, every query is processed.\n
+    **Note**: The responses are returned in the order of the queries, with the same
+    format as `/intent_query/`.
+    """
+    try:
+        with request_duration.labels(endpoint="intent_query_batch").time():
+            raw_responses = await IntentHandler.abatch(query.user_queries)
+        return {"responses": list(map(_batch_response, raw_responses))}
     except Exception as e:
         return {"error": str(e)}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Metrics of the application in the Prometheus text format:\n
+    - `pokemon_assistant_request_duration_seconds{endpoint}`: latency per endpoint.\n
+    - `pokemon_assistant_stage_duration_seconds{stage}`: latency per pipeline stage
+    (`tagging`, `entity_extraction`, `api_tool`, `rag`, `retrieval`, and the
+    `batch_*` stages of `/intent_query/batch`).\n
+    - `pokemon_assistant_llm_request_duration_seconds{stage}`: latency per LLM
+    request, by the stage that sent it (`rag` is the answer generation).\n
+    - `pokemon_assistant_llm_tokens_total{stage, type}`: prompt and completion
+    tokens.\n
+    - `pokemon_assistant_cache_{hits_total, misses_total, size}{cache}`: counters of
+    the LLM, semantic and PokeAPI caches.\n
+    - The process and Python runtime metrics of `prometheus_client`.
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
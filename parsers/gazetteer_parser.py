@@ -0,0 +1,110 @@
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+from parsers.info_output_parser import PokemonEntity, PokemonEntityList
+from tools.pokeapi_client import normalize_name
+
+
+class PokemonGazetteer:
+    """Extract Pokémon names from a text without the LLM, by scanning it once with an
+    Aho-Corasick automaton built over every known name and alias. The text is
+    normalized like the names requested to the PokeAPI (e.g. 'Mr. Mime' -> 'mr-mime'),
+    matches must be whole words, and overlapping matches are resolved by keeping the
+    leftmost and then the longest one (e.g. 'porygon-z' over 'porygon').
+    Attributes:
+        aliases (Dict[str, str]): Alias (normalized) mapped to its Pokémon name.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self.aliases = self._build_aliases(list(names))
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[Tuple[int, str]]] = [[]]
+        for alias, name in self.aliases.items():
+            self._add_pattern(alias, name)
+        self._build_failure_links()
+
+    @staticmethod
+    def _build_aliases(names: List[str]) -> Dict[str, str]:
+        """Map every name to itself, and the base name of the forms (e.g. 'deoxys' for
+        'deoxys-normal') to the first form listed, when the base is not a Pokémon name
+        on its own and long enough to not be a common word.
+        Args:
+            names (List[str]): Pokémon names as stored (PokeAPI convention), ordered
+            by id so the default form comes first.
+        Returns:
+            Dict[str, str]: Alias mapped to its Pokémon name.
+        """
+        aliases = {name: name for name in names}
+        for name in names:
+            base = name.split("-")[0]
+            if len(base) >= 5 and base not in aliases:
+                aliases[base] = name
+        return aliases
+
+    def _add_pattern(self, pattern: str, name: str) -> None:
+        """Add a pattern to the trie of the automaton."""
+        node = 0
+        for char in pattern:
+            if char not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+                self._goto[node][char] = len(self._goto) - 1
+            node = self._goto[node][char]
+        self._outputs[node].append((len(pattern), name))
+
+    def _build_failure_links(self) -> None:
+        """Link each node to its longest proper suffix in the trie (breadth first),
+        so the outputs of the suffixes are reported too."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                if self._fail[child] == child:
+                    self._fail[child] = 0
+                self._outputs[child] = (
+                    self._outputs[child] + self._outputs[self._fail[child]]
+                )
+
+    def _scan(self, text: str) -> List[Tuple[int, int, str]]:
+        """Find every whole-word occurrence of the aliases in a single pass.
+        Args:
+            text (str): Normalized text.
+        Returns:
+            List[Tuple[int, int, str]]: Start, end and Pokémon name of each match.
+        """
+        matches, node = [], 0
+        for end, char in enumerate(text, start=1):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, name in self._outputs[node]:
+                start = end - length
+                before = text[start - 1] if start else "-"
+                after = text[end] if end < len(text) else "-"
+                if not before.isalnum() and not after.isalnum():
+                    matches.append((start, end, name))
+        return matches
+
+    def extract(self, text: str) -> PokemonEntityList:
+        """Extract the Pokémon mentioned in a text, in order of appearance.
+        Args:
+            text (str): Text to extract the Pokémon entities from.
+        Returns:
+            PokemonEntityList: Pokémon entities, empty if none was found.
+        """
+        names, last_end = [], 0
+        for start, end, name in sorted(
+            self._scan(normalize_name(text)), key=lambda m: (m[0], m[0] - m[1])
+        ):
+            if start >= last_end:
+                names.append(name)
+                last_end = end
+        return PokemonEntityList(
+            name_list=[PokemonEntity(name=name) for name in dict.fromkeys(names)]
+        )
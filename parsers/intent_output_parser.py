@@ -1,5 +1,7 @@
+from typing import List
 from langchain.output_parsers.openai_functions import PydanticOutputFunctionsParser
 from langchain_core.pydantic_v1 import BaseModel, Field
+from parsers.info_output_parser import PokemonEntity
 
 
 class IntentTagger(BaseModel):
@@ -21,3 +23,15 @@ class IntentTagger(BaseModel):
 
 
 intent_parser = PydanticOutputFunctionsParser(pydantic_schema=IntentTagger)
+
+
+class IntentEntityTagger(IntentTagger):
+    """Tag the piece of text with particular intent type, detect the text structure
+    describing the intent, and extract the list of Pokémon names mentioned in text"""
+
+    name_list: List[PokemonEntity] = Field(
+        description="List of names of the Pokémon mentioned in text", default=[]
+    )
+
+
+intent_entity_parser = PydanticOutputFunctionsParser(pydantic_schema=IntentEntityTagger)
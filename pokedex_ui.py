@@ -1,7 +1,8 @@
 import streamlit as st
 from conf.config_loader import default_messages
-from typing import List, Dict
+from typing import Any, Dict, Iterator
 from textwrap import dedent
+import json
 import logging
 import os
 import requests
@@ -33,29 +34,77 @@ for msg in st.session_state.messages:
     st.chat_message(msg["role"]).write(msg["content"])
 
 
-def display_content(
-    body_list: List[str], sprites_dict: Dict[str, List[str]], nlp_answer=False
-):
-    """Display the response content.
+def read_events(api_response: requests.Response) -> Iterator[Dict[str, Any]]:
+    """Read the NDJSON events of the streaming API as they arrive.
     Args:
-        body_list (List[str]): List of responses as text.
-        sprites_dict (Dict[str, List[str]]): Dictionary of lists of components.
-        nlp_answer (bool): NLP answer flag.
+        api_response (requests.Response): Streamed response of the API.
+    Returns:
+        Iterator[Dict[str, Any]]: Events, until the complete response is received.
     """
-    with st.container():
-        for i in range(len(body_list)):
-            st.write(body_list[i])
-
-            if not nlp_answer:
-                st.session_state.messages.append(
-                    {"role": "assistant", "content": body_list[i]}
+    for line in api_response.iter_lines():
+        if not line:
+            continue
+        event = json.loads(line)
+        if event["event"] == "error":
+            raise RuntimeError(event["data"])
+        yield event
+
+
+def display_stream(events: Iterator[Dict[str, Any]]) -> Dict[str, Any]:
+    """Display the response progressively: the header, the Pokémon cards and the
+    tokens of the answers are written in place as soon as they are received.
+    Args:
+        events (Iterator[Dict[str, Any]]): Events of the streaming API.
+    Returns:
+        Dict[str, Any]: Complete response.
+    """
+    with st.chat_message("assistant"):
+        header_slot, header, cards = st.empty(), "", []
+        for event in events:
+            kind, index, data = event["event"], event.get("index"), event["data"]
+            if kind == "done":
+                return data
+            if kind == "header" or index is None:
+                header = data if kind == "header" else header + data
+                header_slot.write(header)
+                continue
+
+            while len(cards) <= index:  # Keep the cards in order
+                cards.append(
+                    dict(
+                        body=st.empty(), sprites=st.empty(), text=st.empty(), answer=""
+                    )
                 )
-
-            if sprites_dict:
-                current_sprites = list(sprites_dict.values())[i]
-                cols = st.columns(len(current_sprites))
-                for col, sprite in zip(cols, current_sprites):
-                    col.image(sprite, use_column_width=True)
+            card = cards[index]
+            if kind == "card":
+                card["body"].write(data["body"])
+                if data["sprites"]:
+                    with card["sprites"].container():
+                        cols = st.columns(len(data["sprites"]))
+                        for col, sprite in zip(cols, data["sprites"]):
+                            col.image(sprite, use_column_width=True)
+            else:
+                card["answer"] += data
+                card["text"].write(card["answer"])
+    raise RuntimeError("The response stream ended before completion")
+
+
+def record_response(response: Dict[str, Any]):
+    """Append the displayed response to the chat history.
+    Args:
+        response (Dict[str, Any]): Complete response.
+    """
+    body = response.get("body", None)
+    if not body or response.get("intent_structure", "") in [
+        "natural_language_question",
+        "natural_language_description",
+    ]:
+        st.session_state.messages.append(
+            {"role": "assistant", "content": response.get("header", "")}
+        )
+    else:
+        for content in body:
+            st.session_state.messages.append({"role": "assistant", "content": content})
 
 
 if user_query := st.chat_input():
@@ -69,47 +118,27 @@ if user_query := st.chat_input():
     logger.info("Executing the intent handler with LLM model")
     try:
         BASE_URL = f"{os.environ['API_URL']}:{os.environ['API_PORT']}"
-        api_response = requests.post(
-            f"{BASE_URL}/intent_query/", json={"user_query": user_query}
-        )
-        response = api_response.json()["response"]
+        # The response is streamed, so it's displayed while the pipeline runs
+        with requests.post(
+            f"{BASE_URL}/intent_query/stream",
+            json={"user_query": user_query},
+            stream=True,
+        ) as api_response:
+            api_response.raise_for_status()
+            events = read_events(api_response)
+            if display_json:
+                response = next(
+                    event["data"] for event in events if event["event"] == "done"
+                )
+            else:
+                response = display_stream(events)
     except Exception as e:
         st.error(f"Error on API call: {e}")
         st.stop()
 
     # Display the response
-    header = response.get("header", "")
-    body = response.get("body", None)
-    sprites = response.get("sprites", {})
-    sections = response.get("sections", None)
-    intent_type = response.get("intent_type", "")
-    intent_structure = response.get("intent_structure", "")
-    no_intent = response.get("no_intent", False)
-    error = response.get("error", False)
-
     if display_json:
         st.json(response, expanded=False)
         st.session_state.messages.append({"role": "assistant", "content": response})
     else:
-        if no_intent:
-            st.chat_message("assistant").write(header)
-            st.session_state.messages.append({"role": "assistant", "content": header})
-        elif error:
-            st.chat_message("assistant").write(header)
-            st.session_state.messages.append({"role": "assistant", "content": header})
-        else:
-            st.chat_message("assistant").write(header)
-            if intent_type == "information_request":
-                if intent_structure in [
-                    "natural_language_question",
-                    "natural_language_description",
-                ]:
-                    display_content(body, sprites, nlp_answer=True)
-                    st.session_state.messages.append(
-                        {"role": "assistant", "content": header}
-                    )
-                elif intent_structure == "pokemon_names":
-                    display_content(body, sprites)
-
-            elif intent_type in ["defense_suggestion", "squad_build"]:
-                display_content(body, sprites)
+        record_response(response)
@@ -0,0 +1,120 @@
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import tiktoken
+from langchain_core.documents import Document
+from setup_loader import SetupLoader
+
+app_setup = SetupLoader()
+logger = app_setup.logger
+
+# Shortest common span considered an overlap between two chunks, so unrelated chunks
+# sharing a few characters are not merged
+MIN_OVERLAP = 20
+
+
+class _ApproximateEncoding:
+    """Stand-in of the tiktoken encoding when its files can't be downloaded (offline
+    runs), a token is approximated as 4 characters."""
+
+    def encode(self, text: str) -> List[str]:
+        return [text[i : i + 4] for i in range(0, len(text), 4)]
+
+    def decode(self, tokens: List[str]) -> str:
+        return "".join(tokens)
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    """Encoding used to count the tokens of the model.
+    Args:
+        model (str): Model name.
+    Returns:
+        tiktoken.Encoding: Encoding, approximated if it can't be loaded.
+    """
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:  # The encoding files are downloaded on first use
+        logger.warning(f"Token encoding unavailable ({e}), approximating the tokens")
+        return _ApproximateEncoding()
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right`.
+    Args:
+        left (str): Preceding text.
+        right (str): Following text.
+    Returns:
+        int: Overlap length, 0 if it is shorter than `MIN_OVERLAP`.
+    """
+    for length in range(min(len(left), len(right)), MIN_OVERLAP - 1, -1):
+        if left.endswith(right[:length]):
+            return length
+    return 0
+
+
+def _merge(sections: List[str], text: str) -> None:
+    """Add a chunk to the sections of its page, merging it with the section it
+    overlaps (in either direction) and dropping it if it is already contained. A
+    merged section is merged again, as it may now bridge two sections (chunks are
+    retrieved by relevance, not in page order).
+    Args:
+        sections (List[str]): Merged sections of a page, updated in place.
+        text (str): Chunk text.
+    """
+    for i, section in enumerate(sections):
+        if text in section:
+            return
+        if section in text:
+            merged = text
+        elif overlap := _overlap(section, text):
+            merged = section + text[overlap:]
+        elif overlap := _overlap(text, section):
+            merged = text + section[overlap:]
+        else:
+            continue
+        del sections[i]
+        _merge(sections, merged)
+        return
+    sections.append(text)
+
+
+def pack_context(
+    docs: List[Document], max_tokens: Optional[int] = None, model: str = "gpt-4"
+) -> str:
+    """Pack the retrieved chunks into the context of a RAG prompt. Chunks of the same
+    page are merged where they overlap (the splitter repeats `chunk_overlap`
+    characters between consecutive chunks) and duplicated spans are dropped, then the
+    context is trimmed to a token budget keeping the most relevant pages first.
+    Args:
+        docs (List[Document]): Retrieved chunks, most relevant first.
+        max_tokens (Optional[int], optional): Token budget of the context, None for
+        no limit. Defaults to None.
+        model (str, optional): Model used to count tokens. Defaults to "gpt-4".
+    Returns:
+        str: Context.
+    """
+    pages: Dict[Tuple, List[str]] = {}
+    for doc in docs:
+        page = (doc.metadata.get("source"), doc.metadata.get("page", id(doc)))
+        _merge(pages.setdefault(page, []), doc.page_content.strip())
+    sections = [section for page in pages.values() for section in page]
+
+    if max_tokens is None:
+        return "\n\n".join(sections)
+
+    encoding = _get_encoding(model)
+    separator_tokens = len(encoding.encode("\n\n"))
+
+    packed, budget = [], max_tokens
+    for section in sections:
+        tokens = encoding.encode(section)
+        if len(tokens) > budget:
+            if budget > 0:  # Keep the head of the section that still fits
+                packed.append(encoding.decode(tokens[:budget]))
+            break
+        packed.append(section)
+        budget -= len(tokens) + separator_tokens
+    return "\n\n".join(packed)
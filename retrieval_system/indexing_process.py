@@ -1,10 +1,28 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import (
     CharacterTextSplitter,
     RecursiveCharacterTextSplitter,
+    TextSplitter,
 )
-from langchain_openai import OpenAIEmbeddings
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_community.vectorstores import FAISS
+from retrieval_system.pokemon_retriever import NAME_INDEX_FILE
+from tools.pokeapi_client import normalize_name
 from setup_loader import SetupLoader
 
 app_setup = SetupLoader()
@@ -15,43 +33,432 @@ base_llm, logger, global_conf, prompt_template_library = (
     app_setup.prompt_template_library,
 )
 
+INDEX_PATH = f"{global_conf['VECTOR_STORE_PATH']}/pokedex_index_react"
+# Written last when the index is saved, the API reloads the index when it changes
+MANIFEST_FILE = "manifest.json"
+# Header of each Pokédex entry in the source file (e.g. "018. CHARIZARD")
+POKEMON_HEADER_PATTERN = re.compile(
+    r"^\s*\d{3,4}\.\s+([A-Z][A-Z0-9 .'’:♀♂-]*?)\s*$", re.MULTILINE
+)
+
 
-def _index_vector_store() -> None:
-    """Void Function to create an RAG index inside a vector store from the source
-    file."""
-    logger.info("Loading & Splitting Source File")
-    pdf_path = f"{global_conf['SOURCE_PDF_PATH']}/pokedex_tabletop_content.pdf"
+def _stream_pages() -> Iterator[Document]:
+    """Stream the pages of the source files one at a time, so the sources are never
+    fully loaded in memory.
+    Returns:
+        Iterator[Document]: Pages of the source files (`SOURCE_PDF_FILES`).
+    """
+    for pdf_file in global_conf["SOURCE_PDF_FILES"]:
+        pdf_path = f"{global_conf['SOURCE_PDF_PATH']}/{pdf_file}"
+        logger.info(f"Streaming Source File '{pdf_path}'")
+        loader = PyPDFLoader(file_path=pdf_path)
+        for doc in loader.lazy_load():
+            if isinstance(doc.page_content, str) and doc.page_content.split() != "":
+                yield doc
 
-    loader = PyPDFLoader(file_path=pdf_path)
-    documents = loader.load()
-    documents = [
-        doc
-        for doc in documents
-        if isinstance(doc.page_content, str) and doc.page_content.split() != ""
-    ]
 
+def _get_text_splitter() -> TextSplitter:
+    """Create the splitter of the source pages.
+    Returns:
+        TextSplitter: Text splitter.
+    """
     # Sample document has 343 pages, each Pokémon has 60 +- 10 words
     if global_conf["RECURSIVE_SPLITTER"]:
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1100, chunk_overlap=200
-        )
-    else:  # Split based on the separator at the end of the page
-        text_splitter = CharacterTextSplitter(
-            chunk_size=1100,  # 60
-            chunk_overlap=200,
-            separator="^([0-9A-Z]+)\.\s([A-Z\s]+)$",
-            is_separator_regex=True,
+        return RecursiveCharacterTextSplitter(chunk_size=1100, chunk_overlap=200)
+    # Split based on the separator at the end of the page
+    return CharacterTextSplitter(
+        chunk_size=1100,  # 60
+        chunk_overlap=200,
+        separator="^([0-9A-Z]+)\.\s([A-Z\s]+)$",
+        is_separator_regex=True,
+    )
+
+
+def _detect_pokemon(text: str) -> List[str]:
+    """Detect the Pokémon described by a page from its entry headers, the source file
+    has one entry per Pokémon (a few pages hold two).
+    Args:
+        text (str): Page content.
+    Returns:
+        List[str]: Pokémon names, normalized to the PokeAPI naming convention.
+    """
+    names = [normalize_name(m) for m in POKEMON_HEADER_PATTERN.findall(text)]
+    return list(dict.fromkeys(names))
+
+
+def _stream_chunks(pages: Iterable[Document]) -> Iterator[Tuple[str, Document]]:
+    """Split the pages as they are streamed into chunks identified by the hash of
+    their content. Repeated chunks are only yielded once. The Pokémon described by
+    each page is added to the metadata (`pokemon`) of its chunks.
+    Args:
+        pages (Iterable[Document]): Pages of the source files.
+    Returns:
+        Iterator[Tuple[str, Document]]: Chunk ids and chunks, in document order.
+    """
+    text_splitter = _get_text_splitter()
+    seen_ids = set()
+    for page in pages:
+        pokemon = _detect_pokemon(page.page_content)
+        if pokemon:
+            page.metadata["pokemon"] = pokemon
+        for doc in text_splitter.split_documents(documents=[page]):
+            chunk_id = _chunk_id(doc)
+            if chunk_id not in seen_ids:
+                seen_ids.add(chunk_id)
+                yield chunk_id, doc
+
+
+def _chunk_id(doc: Document) -> str:
+    """Content hash of a chunk, it only changes when the chunk text (or its source
+    file) changes, so unchanged chunks keep their vectors between indexing runs.
+    Args:
+        doc (Document): Chunk.
+    Returns:
+        str: Chunk id.
+    """
+    content = f"{doc.metadata.get('source', '')}\n{doc.page_content}"
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _get_chunk_embeddings(embeddings: Embeddings) -> Embeddings:
+    """Wrap the embedding model with the on-disk embedding cache, if enabled. Vectors
+    are stored by text hash under the model name, so any chunk already embedded by a
+    previous build (whatever its split settings) is never embedded again.
+    Args:
+        embeddings (Embeddings): Embedding model (`SetupLoader.embeddings`).
+    Returns:
+        Embeddings: Embedding model used for the chunks.
+    """
+    if not global_conf["EMBEDDING_CACHE_ENABLED"]:
+        return embeddings
+    return CacheBackedEmbeddings.from_bytes_store(
+        underlying_embeddings=embeddings,
+        document_embedding_cache=LocalFileStore(global_conf["EMBEDDING_CACHE_PATH"]),
+        namespace=embeddings.model,
+    )
+
+
+def _build_name_index(vectorstore: FAISS) -> Dict[str, List[str]]:
+    """Build the inverted index of the Pokémon names to the ids of the chunks that
+    describe them, used to retrieve an entry without a similarity search.
+    Args:
+        vectorstore (FAISS): Index.
+    Returns:
+        Dict[str, List[str]]: Chunk ids in index order mapped by Pokémon name.
+    """
+    name_index = {}
+    for chunk_id in vectorstore.index_to_docstore_id.values():
+        for name in vectorstore.docstore.search(chunk_id).metadata.get("pokemon", []):
+            name_index.setdefault(name, []).append(chunk_id)
+    return name_index
+
+
+def _read_manifest() -> Optional[Dict]:
+    """Read the manifest saved with the index.
+    Returns:
+        Optional[Dict]: Manifest, or None if there is no index to update.
+    """
+    manifest_path = os.path.join(INDEX_PATH, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, "r") as file:
+        return json.load(file)
+
+
+class _RateLimiter:
+    """Space out the embedding requests to stay under a requests per minute limit,
+    shared by every worker thread."""
+
+    def __init__(self, requests_per_minute: float):
+        self.interval = 60.0 / requests_per_minute
+        self._next_request = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_request - now
+            self._next_request = max(now, self._next_request) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _read_checkpoint(checkpoint_path: str, model: str) -> Dict[str, List[float]]:
+    """Read the embeddings saved by an interrupted run with the same model. A line
+    left incomplete by the interruption is ignored.
+    Args:
+        checkpoint_path (str): Path of the JSON lines checkpoint.
+        model (str): Embedding model of the current run.
+    Returns:
+        Dict[str, List[float]]: Embeddings mapped by chunk id.
+    """
+    if not os.path.exists(checkpoint_path):
+        return {}
+    vectors = {}
+    with open(checkpoint_path, "r") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record["model"] == model:
+                vectors[record["id"]] = record["embedding"]
+    return vectors
+
+
+class _ChunkEmbedder:
+    """Embed chunks in batches over a bounded pool of workers, respecting the
+    requests per minute limit. Every finished batch is appended to a checkpoint
+    file, so an interrupted run resumes with the chunks that are still missing.
+    Attributes:
+        embeddings (Embeddings): Embedding model used for the chunks.
+        model (str): Name of the embedding model (checkpoint key).
+        batch_size (int): Chunks per embedding request.
+        window_size (int): Chunks embedded at the same time by the pool, the chunk
+        stream is consumed in windows of this size.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str):
+        self.embeddings = embeddings
+        self.model = model
+        self.batch_size = global_conf["EMBEDDING_BATCH_SIZE"]
+        self.window_size = self.batch_size * global_conf["EMBEDDING_MAX_WORKERS"]
+        self.checkpoint_path = global_conf["EMBEDDING_CHECKPOINT_PATH"]
+        self._checkpoint_vectors = _read_checkpoint(self.checkpoint_path, model)
+        if self._checkpoint_vectors:
+            logger.info(
+                f"Resuming from checkpoint: {len(self._checkpoint_vectors)} chunks "
+                "already embedded"
+            )
+        self._rate_limiter = _RateLimiter(global_conf["EMBEDDING_REQUESTS_PER_MINUTE"])
+        self._pool = ThreadPoolExecutor(
+            max_workers=global_conf["EMBEDDING_MAX_WORKERS"]
         )
+        os.makedirs(os.path.dirname(self.checkpoint_path) or ".", exist_ok=True)
+        self._checkpoint = open(self.checkpoint_path, "a")
+
+    def __enter__(self) -> "_ChunkEmbedder":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._pool.shutdown()
+        self._checkpoint.close()
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        self._rate_limiter.wait()
+        return self.embeddings.embed_documents(texts)
+
+    def embed(self, chunks: Dict[str, Document]) -> Dict[str, List[float]]:
+        """Embed a window of chunks, the ones found in the checkpoint are reused.
+        Args:
+            chunks (Dict[str, Document]): Chunks to embed mapped by id.
+        Returns:
+            Dict[str, List[float]]: Embeddings mapped by chunk id.
+        """
+        vectors = {
+            chunk_id: self._checkpoint_vectors.pop(chunk_id)
+            for chunk_id in chunks
+            if chunk_id in self._checkpoint_vectors
+        }
+        pending_ids = [chunk_id for chunk_id in chunks if chunk_id not in vectors]
+        futures = {
+            self._pool.submit(
+                self._embed_batch,
+                [chunks[chunk_id].page_content for chunk_id in batch_ids],
+            ): batch_ids
+            for batch_ids in (
+                pending_ids[i : i + self.batch_size]
+                for i in range(0, len(pending_ids), self.batch_size)
+            )
+        }
+        for future in as_completed(futures):
+            for chunk_id, vector in zip(futures[future], future.result()):
+                vectors[chunk_id] = vector
+                record = {"id": chunk_id, "model": self.model, "embedding": vector}
+                self._checkpoint.write(json.dumps(record) + "\n")
+            self._checkpoint.flush()
+        return vectors
+
+
+def _add_chunks(
+    vectorstore: Optional[FAISS],
+    chunks: Dict[str, Document],
+    embedder: _ChunkEmbedder,
+) -> FAISS:
+    """Embed a window of chunks and add them to the index.
+    Args:
+        vectorstore (Optional[FAISS]): Index to update, None to create it.
+        chunks (Dict[str, Document]): Chunks mapped by id.
+        embedder (_ChunkEmbedder): Chunk embedder.
+    Returns:
+        FAISS: Updated index.
+    """
+    vectors = embedder.embed(chunks)
+    text_embeddings = {
+        "text_embeddings": [
+            (chunk.page_content, vectors[chunk_id])
+            for chunk_id, chunk in chunks.items()
+        ],
+        "metadatas": [chunk.metadata for chunk in chunks.values()],
+        "ids": list(chunks),
+    }
+    if vectorstore is None:
+        return FAISS.from_embeddings(embedding=embedder.embeddings, **text_embeddings)
+    vectorstore.add_embeddings(**text_embeddings)
+    return vectorstore
+
 
-    docs = text_splitter.split_documents(documents=documents)
+def _ingest(
+    vectorstore: Optional[FAISS],
+    chunks: Iterator[Tuple[str, Document]],
+    embedder: _ChunkEmbedder,
+) -> Tuple[Optional[FAISS], Dict[str, int]]:
+    """Synchronize an index with the chunk stream, window by window: new chunks are
+    embedded and added, chunks already indexed are kept (refreshing their metadata
+    if it changed), and indexed chunks missing from the stream are deleted at the
+    end. Only the current window of chunks is held besides the index.
+    Args:
+        vectorstore (Optional[FAISS]): Index to update, None to create it.
+        chunks (Iterator[Tuple[str, Document]]): Chunk ids and chunks.
+        embedder (_ChunkEmbedder): Chunk embedder.
+    Returns:
+        Tuple[Optional[FAISS], Dict[str, int]]: Updated index (None if there was no
+        chunk), and the number of added, removed, unchanged and relocated chunks
+        (same content, different metadata such as the page number).
+    """
+    stored_ids = (
+        set(vectorstore.index_to_docstore_id.values()) if vectorstore else set()
+    )
+    report = {"added": 0, "removed": 0, "unchanged": 0, "relocated": 0}
+    seen_ids = set()
 
-    logger.info("Embedding Source File")
-    vectorstore = FAISS.from_documents(documents=docs, embedding=OpenAIEmbeddings())
+    while window := list(islice(chunks, embedder.window_size)):
+        new_chunks = {}
+        for chunk_id, chunk in window:
+            seen_ids.add(chunk_id)
+            if chunk_id not in stored_ids:
+                new_chunks[chunk_id] = chunk
+                continue
+            report["unchanged"] += 1
+            if vectorstore.docstore.search(chunk_id).metadata != chunk.metadata:
+                # Refresh the stored metadata, the vector is still valid
+                vectorstore.docstore.delete([chunk_id])
+                vectorstore.docstore.add({chunk_id: chunk})
+                report["relocated"] += 1
+        if new_chunks:
+            vectorstore = _add_chunks(vectorstore, new_chunks, embedder)
+            report["added"] += len(new_chunks)
+            logger.info(f"Indexed {report['added']} new chunks")
+
+    stale_ids = list(stored_ids - seen_ids)
+    if stale_ids:
+        vectorstore.delete(ids=stale_ids)
+        report["removed"] = len(stale_ids)
+
+    return vectorstore, report
+
+
+def _save_index(vectorstore: FAISS, manifest: Dict) -> None:
+    """Save the index files into a temporary folder, then move each one into
+    `INDEX_PATH` with an atomic rename, the manifest last. A reader never sees a
+    partially written file, and the manifest only changes once the FAISS index and
+    the name index it describes are in place.
+    Args:
+        vectorstore (FAISS): Vector store to save.
+        manifest (Dict): Embedding model and number of chunks of the index.
+    """
+    os.makedirs(INDEX_PATH, exist_ok=True)
+    staging_path = tempfile.mkdtemp(
+        prefix=".staging-", dir=os.path.dirname(os.path.abspath(INDEX_PATH))
+    )
+    try:
+        vectorstore.save_local(staging_path)
+        with open(os.path.join(staging_path, NAME_INDEX_FILE), "w") as file:
+            json.dump(_build_name_index(vectorstore), file)
+        with open(os.path.join(staging_path, MANIFEST_FILE), "w") as file:
+            json.dump(manifest, file, indent=2)
+        # Moved last, so the manifest never describes files not yet in place
+        for file_name in sorted(
+            os.listdir(staging_path), key=lambda file_name: file_name == MANIFEST_FILE
+        ):
+            os.replace(
+                os.path.join(staging_path, file_name),
+                os.path.join(INDEX_PATH, file_name),
+            )
+    finally:
+        shutil.rmtree(staging_path, ignore_errors=True)
+
+
+def _index_vector_store(
+    full_rebuild: bool = False, pages: Optional[Iterable[Document]] = None
+) -> Dict[str, int]:
+    """Create or update the RAG index inside a vector store from the source files.
+    The sources are ingested as a stream (page -> filter -> split -> embed batch ->
+    add to index), so memory does not grow with the size of the sources. Chunks are
+    identified by their content hash, so an existing index is updated
+    incrementally: stale vectors are deleted and only new chunks are embedded (see
+    `_ChunkEmbedder` for the batching and the checkpoint of the embeddings). The
+    index is rebuilt when there is none, when the embedding model changed, or when
+    `full_rebuild` is requested.
+    Args:
+        full_rebuild (bool, optional): Embed every chunk again. Defaults to False.
+        pages (Optional[Iterable[Document]], optional): Pages to index instead of the
+        source files (e.g. the offline fixture). Defaults to None.
+    Returns:
+        Dict[str, int]: Number of added, removed, unchanged and relocated chunks.
+    """
+    embeddings = app_setup.embeddings
+    manifest = _read_manifest()
+    rebuild = (
+        full_rebuild
+        or manifest is None
+        or manifest["embedding_model"] != embeddings.model
+    )
+    if rebuild:
+        logger.info("Embedding Source Files")
+        vectorstore = None
+    else:
+        logger.info("Updating Vector Store")
+        vectorstore = FAISS.load_local(folder_path=INDEX_PATH, embeddings=embeddings)
+
+    with _ChunkEmbedder(
+        embeddings=_get_chunk_embeddings(embeddings), model=embeddings.model
+    ) as embedder:
+        vectorstore, report = _ingest(
+            vectorstore=vectorstore,
+            chunks=_stream_chunks(_stream_pages() if pages is None else pages),
+            embedder=embedder,
+        )
+    if rebuild and manifest:
+        report["removed"] = manifest["chunks"]
+
+    logger.info(f"Indexing report: {report}")
+    if vectorstore is None:
+        logger.warning("No content found in the source files")
+        return report
+    if not (report["added"] or report["removed"] or report["relocated"]):
+        logger.info("Vector Store is up to date")
+        return report
 
     logger.info("Saving Vector Store")
-    vectorstore.save_local(f"{global_conf['VECTOR_STORE_PATH']}/pokedex_index_react")
+    _save_index(
+        vectorstore,
+        manifest={
+            "embedding_model": embeddings.model,
+            "chunks": len(vectorstore.index_to_docstore_id),
+        },
+    )
+    if os.path.exists(global_conf["EMBEDDING_CHECKPOINT_PATH"]):
+        os.remove(global_conf["EMBEDDING_CHECKPOINT_PATH"])
+    return report
 
 
 if __name__ == "__main__":
-    logger.info("Creating New Vector Store")
-    _index_vector_store()
+    parser = argparse.ArgumentParser(description="Index the source files")
+    parser.add_argument(
+        "--full", action="store_true", help="Embed every chunk again (full rebuild)"
+    )
+    args = parser.parse_args()
+
+    logger.info("Creating New Vector Store" if args.full else "Indexing Vector Store")
+    _index_vector_store(full_rebuild=args.full)
@@ -0,0 +1,83 @@
+from typing import Dict, List
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from parsers.gazetteer_parser import PokemonGazetteer
+
+# Inverted index of Pokémon names to chunk ids, saved next to the FAISS index
+NAME_INDEX_FILE = "pokemon_index.json"
+
+
+class PokemonLookupRetriever(BaseRetriever):
+    """Retriever that serves the Pokédex entries of the Pokémon named in the query
+    directly from the inverted name index built by the indexing process, without a
+    similarity search. Queries that don't name an indexed Pokémon are answered by
+    the fallback (vector search) retriever.
+    Attributes:
+        vectorstore (FAISS): Vector store holding the chunks.
+        name_index (Dict[str, List[str]]): Chunk ids mapped by Pokémon name.
+        gazetteer (PokemonGazetteer): Matcher of the indexed names in the query.
+        fallback (BaseRetriever): Retriever used when no entry is found.
+    """
+
+    vectorstore: FAISS
+    name_index: Dict[str, List[str]]
+    gazetteer: PokemonGazetteer
+    fallback: BaseRetriever
+
+    @classmethod
+    def from_name_index(
+        cls,
+        vectorstore: FAISS,
+        name_index: Dict[str, List[str]],
+        fallback: BaseRetriever,
+    ) -> "PokemonLookupRetriever":
+        """Create the retriever over a vector store and its name index.
+        Args:
+            vectorstore (FAISS): Vector store holding the chunks.
+            name_index (Dict[str, List[str]]): Chunk ids mapped by Pokémon name.
+            fallback (BaseRetriever): Similarity search retriever.
+        Returns:
+            PokemonLookupRetriever: Retriever, falling back to similarity search.
+        """
+        return cls(
+            vectorstore=vectorstore,
+            name_index=name_index,
+            gazetteer=PokemonGazetteer(names=name_index),
+            fallback=fallback,
+        )
+
+    def _lookup(self, query: str) -> List[Document]:
+        """Chunks of the entries of the Pokémon named in the query.
+        Args:
+            query (str): Query.
+        Returns:
+            List[Document]: Chunks in document order, empty if no entry was found.
+        """
+        chunk_ids = [
+            chunk_id
+            for entity in self.gazetteer.extract(query).name_list
+            for chunk_id in self.name_index[entity.name]
+        ]
+        return [
+            self.vectorstore.docstore.search(chunk_id)
+            for chunk_id in dict.fromkeys(chunk_ids)
+        ]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self._lookup(query) or self.fallback.get_relevant_documents(
+            query, callbacks=run_manager.get_child()
+        )
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self._lookup(query) or await self.fallback.aget_relevant_documents(
+            query, callbacks=run_manager.get_child()
+        )
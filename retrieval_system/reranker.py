@@ -0,0 +1,92 @@
+import numpy as np
+from typing import List
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+
+class RerankingRetriever(BaseRetriever):
+    """Retriever that over-fetches `fetch_k` candidates from the FAISS index and
+    reranks them by maximal marginal relevance (MMR), keeping the top `k`. The
+    Pokédex entries are split into overlapping chunks, so the nearest candidates are
+    often chunks of the same entry repeating each other, and the defense and squad
+    suggestions need several Pokémon in the context. Each pick maximizes
+    `lambda_mult * relevance - (1 - lambda_mult) * redundancy`, the cosine similarity
+    to the query minus the highest one to the documents already picked. The
+    candidate vectors are reconstructed from the index by position and compared with
+    matrix products, so the rerank stage adds no embedding requests (the query is
+    embedded once, for both the search and the rerank).
+    Attributes:
+        vectorstore (FAISS): Vector store holding the chunks.
+        k (int): Number of documents returned.
+        fetch_k (int): Number of candidates fetched from the index before reranking.
+        lambda_mult (float): Weight of the relevance against the diversity, 1 keeps
+        the order of the search.
+    """
+
+    vectorstore: FAISS
+    k: int = 4
+    fetch_k: int = 20
+    lambda_mult: float = 0.7
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """Unit rows, so the dot products are cosine similarities."""
+        return vectors / (np.linalg.norm(vectors, axis=-1, keepdims=True) + 1e-12)
+
+    def _select(self, query: np.ndarray, candidates: np.ndarray) -> List[int]:
+        """Pick the candidates by maximal marginal relevance.
+        Args:
+            query (np.ndarray): Query embedding.
+            candidates (np.ndarray): Candidate embeddings, in search order.
+        Returns:
+            List[int]: Indexes of the top `k` candidates, in order of selection.
+        """
+        candidates = self._normalize(candidates)
+        relevance = candidates @ self._normalize(query)
+        redundancy = np.zeros(len(candidates), dtype=np.float32)
+        selected = []
+        for _ in range(min(self.k, len(candidates))):
+            scores = self.lambda_mult * relevance - (1 - self.lambda_mult) * redundancy
+            scores[selected] = -np.inf
+            best = int(np.argmax(scores))
+            selected.append(best)
+            redundancy = np.maximum(redundancy, candidates @ candidates[best])
+        return selected
+
+    def _rerank(self, query_embedding: List[float]) -> List[Document]:
+        """Search the candidates and rerank them.
+        Args:
+            query_embedding (List[float]): Query embedding.
+        Returns:
+            List[Document]: Top `k` documents, in order of selection.
+        """
+        query = np.asarray([query_embedding], dtype=np.float32)
+        _, positions = self.vectorstore.index.search(query, self.fetch_k)
+        positions = positions[0][positions[0] >= 0]  # -1 pads a short index
+        if positions.size == 0:
+            return []
+
+        candidates = self.vectorstore.index.reconstruct_batch(positions)
+        top = positions[self._select(query[0], candidates)]
+
+        return [
+            self.vectorstore.docstore.search(
+                self.vectorstore.index_to_docstore_id[int(position)]
+            )
+            for position in top
+        ]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self._rerank(self.vectorstore.embeddings.embed_query(query))
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self._rerank(await self.vectorstore.embeddings.aembed_query(query))
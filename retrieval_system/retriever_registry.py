@@ -0,0 +1,215 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+from langchain_community.vectorstores import FAISS
+from langchain_core.retrievers import BaseRetriever
+from retrieval_system.indexing_process import MANIFEST_FILE
+from retrieval_system.pokemon_retriever import NAME_INDEX_FILE, PokemonLookupRetriever
+from retrieval_system.reranker import RerankingRetriever
+from setup_loader import SetupLoader
+
+app_setup = SetupLoader()
+logger, global_conf, embeddings = (
+    app_setup.logger,
+    app_setup.global_conf,
+    app_setup.embeddings,
+)
+
+
+class RetrieverRegistry:
+    """ -- Singleton design pattern to share the vector store across requests --
+    Loads the FAISS index stored under `VECTOR_STORE_PATH` once per process and hands
+    out the same retriever, and the same QA chain per `qa_prompt`, to every caller.
+    The manifest of the index, written last by the indexing process, is
+    fingerprinted, when it changes the vector store is loaded again and swapped
+    atomically, so a reindex goes live without restarting the API. A failed reload
+    is logged and the previous vector store is kept.
+    When `RAG_NAME_LOOKUP` is enabled and the index has a Pokémon name index, the
+    chains built with `name_lookup` (the description lookups of a named Pokémon)
+    serve the entries of the Pokémon named in the query directly
+    (`PokemonLookupRetriever`). The other chains (questions, defense and squad
+    suggestions) always use the similarity search, their queries name Pokémon to
+    counter or exclude rather than the entries to read. The similarity search
+    over-fetches candidates and reranks them by maximal marginal relevance, so the
+    chunks of a same entry don't fill the context, when `RAG_RERANK` is enabled
+    (`RerankingRetriever`).
+    """
+
+    _instance = None
+    _is_initialized = False
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(RetrieverRegistry, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not self.__class__._is_initialized:  # Ensure __init__ is only executed once
+            self.index_path = f"{global_conf['VECTOR_STORE_PATH']}/pokedex_index_react"
+            self.watch_interval = global_conf.get("VECTOR_STORE_WATCH_INTERVAL", 5)
+            self._lock = threading.Lock()
+            self._reload_lock = threading.Lock()
+            self._vectorstore = None
+            self._retriever = None
+            self._lookup_retriever = None
+            self._chains = {}
+            self._fingerprint = None
+            self._last_check = 0.0
+            self.__class__._is_initialized = True
+
+    def _index_fingerprint(self) -> Tuple:
+        """Build a fingerprint of the index (name, size and modification time of the
+        manifest, or of every file of an index saved without manifest).
+        Returns:
+            Tuple: Fingerprint of the index.
+        """
+        file_names = sorted(os.listdir(self.index_path))
+        if MANIFEST_FILE in file_names:
+            file_names = [MANIFEST_FILE]
+        fingerprint = []
+        for file_name in file_names:
+            stat = os.stat(os.path.join(self.index_path, file_name))
+            fingerprint.append((file_name, stat.st_size, stat.st_mtime_ns))
+        return tuple(fingerprint)
+
+    def _load(self, fingerprint: Tuple) -> None:
+        """Load the vector store from disk and swap it with the current one. The new
+        store is fully built before the swap, so readers never see a partial state and
+        keep using the previous version while the new one is loading.
+        Args:
+            fingerprint (Tuple): Fingerprint of the index files being loaded.
+        """
+        logger.info(f"RetrieverRegistry: Loading vector store '{self.index_path}'")
+        vectorstore = FAISS.load_local(
+            folder_path=self.index_path, embeddings=embeddings
+        )
+        retriever = self._build_retriever(vectorstore)
+        lookup_retriever = self._build_lookup_retriever(vectorstore, retriever)
+        with self._lock:
+            self._vectorstore, self._retriever = vectorstore, retriever
+            self._lookup_retriever = lookup_retriever
+            self._chains = {}
+            self._fingerprint = fingerprint
+
+    def _build_retriever(self, vectorstore: FAISS) -> BaseRetriever:
+        """Create the similarity search retriever over the vector store.
+        Args:
+            vectorstore (FAISS): Loaded vector store.
+        Returns:
+            BaseRetriever: Similarity search retriever.
+        """
+        if global_conf["RAG_RERANK"]:
+            return RerankingRetriever(
+                vectorstore=vectorstore,
+                k=global_conf["RAG_TOP_K"],
+                fetch_k=global_conf["RAG_FETCH_K"],
+                lambda_mult=global_conf["RAG_MMR_LAMBDA"],
+            )
+        return vectorstore.as_retriever(search_kwargs={"k": global_conf["RAG_TOP_K"]})
+
+    def _build_lookup_retriever(
+        self, vectorstore: FAISS, similarity_retriever: BaseRetriever
+    ) -> BaseRetriever:
+        """Create the retriever of the description lookups over the vector store.
+        Args:
+            vectorstore (FAISS): Loaded vector store.
+            similarity_retriever (BaseRetriever): Retriever used when no entry is
+            found.
+        Returns:
+            BaseRetriever: Name lookup retriever if its index is available, otherwise
+            the similarity search retriever.
+        """
+        name_index_path = os.path.join(self.index_path, NAME_INDEX_FILE)
+        if not global_conf["RAG_NAME_LOOKUP"] or not os.path.exists(name_index_path):
+            return similarity_retriever
+        with open(name_index_path, "r") as file:
+            name_index = json.load(file)
+        return PokemonLookupRetriever.from_name_index(
+            vectorstore=vectorstore,
+            name_index=name_index,
+            fallback=similarity_retriever,
+        )
+
+    def indexed_names(self) -> List[str]:
+        """Names of the Pokémon in the name index of the vector store, read without
+        loading the index.
+        Returns:
+            List[str]: Pokémon names, empty if the index has no name index.
+        """
+        name_index_path = os.path.join(self.index_path, NAME_INDEX_FILE)
+        if not os.path.exists(name_index_path):
+            return []
+        with open(name_index_path, "r") as file:
+            return list(json.load(file))
+
+    def _refresh(self) -> None:
+        """Load the vector store on first use, or reload it when the files of the index
+        changed since the last check. Checks are throttled by
+        `VECTOR_STORE_WATCH_INTERVAL` seconds."""
+        now = time.monotonic()
+        if self._vectorstore is not None and (
+            now - self._last_check < self.watch_interval
+        ):
+            return
+        with self._reload_lock:  # Only one thread checks and loads at a time
+            if self._vectorstore is not None and (
+                now - self._last_check < self.watch_interval
+            ):
+                return
+            try:
+                fingerprint = self._index_fingerprint()
+                if fingerprint != self._fingerprint:
+                    if self._fingerprint is not None:
+                        logger.info("RetrieverRegistry: Index changed, reloading")
+                    self._load(fingerprint)
+            except Exception as e:
+                if self._vectorstore is None:
+                    raise
+                logger.error(
+                    "RetrieverRegistry: Reloading the index failed, keeping the "
+                    f"previous version: {e}"
+                )
+            self._last_check = time.monotonic()
+
+    @property
+    def vectorstore(self) -> FAISS:
+        """Shared FAISS vector store."""
+        self._refresh()
+        with self._lock:
+            return self._vectorstore
+
+    @property
+    def retriever(self) -> BaseRetriever:
+        """Shared similarity search retriever built over the FAISS vector store."""
+        self._refresh()
+        with self._lock:
+            return self._retriever
+
+    def get_chain(
+        self,
+        qa_prompt: str,
+        chain_builder: Callable[..., Any],
+        name_lookup: bool = False,
+    ) -> Any:
+        """Return the chain built for `qa_prompt`, building it only once per loaded
+        version of the vector store.
+        Args:
+            qa_prompt (str): QA prompt used as cache key.
+            chain_builder (Callable[..., Any]): Function receiving the shared retriever
+            and the `qa_prompt`, returning the chain.
+            name_lookup (bool, optional): Serve the entries of the Pokémon named in
+            the query from the name index (description lookups). Defaults to False.
+        Returns:
+            Any: Chain built for the given QA prompt.
+        """
+        self._refresh()
+        with self._lock:
+            chains: Dict[Tuple[str, bool], Any] = self._chains
+            retriever = self._lookup_retriever if name_lookup else self._retriever
+        key = (qa_prompt, name_lookup)
+        if key not in chains:
+            chain = chain_builder(retriever=retriever, qa_prompt=qa_prompt)
+            chains.setdefault(key, chain)  # Keep the first one on races
+        return chains[key]
@@ -2,7 +2,12 @@ import logging
 import os
 import openai
 from conf.config_loader import global_conf, prompt_template_library
-from langchain_openai import ChatOpenAI
+from langchain_core.embeddings import Embeddings
+from langchain_core.globals import set_llm_cache
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from src.common.llm_cache import SQLiteLRUCache
+from src.common.offline_backends import FakeChatModel, HashingEmbeddings
 from agents.callbacks_agent import AgentCallbackHandler
 from dotenv import load_dotenv
 
@@ -28,15 +33,14 @@ class SetupLoader:
             self._setup_environment()
             self.prompt_template_library = self._setup_prompt_library()
             self.global_conf = self._setup_global_conf()
-            self.chat_openai = self._setup_chat_openai(
-                callbacks=self._setup_callbacks()
-            )
+            self.llm_cache = self._setup_llm_cache()
+            self.callbacks = self._setup_callbacks()
+            self.chat_openai = self._setup_chat_openai(callbacks=self.callbacks)
+            self.embeddings = self._setup_embeddings()
             self.__class__._is_initialized = True
         elif new_model:
             # After the first initialization, a new model can be created
-            self.chat_openai = self._setup_chat_openai(
-                callbacks=self._setup_callbacks()
-            )
+            self.chat_openai = self._setup_chat_openai(callbacks=self.callbacks)
 
     def _setup_logging(self):
         logging.basicConfig(level=logging.INFO)
@@ -49,17 +53,51 @@ class SetupLoader:
         return global_conf
 
     def _setup_callbacks(self):
-        return [AgentCallbackHandler()]
+        """Create the handlers recording the metrics of the LLM requests and
+        retrievals, shared by every chain."""
+        return [
+            AgentCallbackHandler(
+                logger=self.logger,
+                debug_sample_rate=global_conf["LLM_DEBUG_SAMPLE_RATE"],
+            )
+        ]
+
+    def _setup_llm_cache(self):
+        """Register the exact-match LLM response cache, if enabled."""
+        if not global_conf["LLM_CACHE_ENABLED"]:
+            return None
+        llm_cache = SQLiteLRUCache(
+            path=global_conf["LLM_CACHE_PATH"],
+            max_entries=global_conf["LLM_CACHE_MAX_ENTRIES"],
+        )
+        set_llm_cache(llm_cache)
+        return llm_cache
 
     def _setup_environment(self):
         """Set the OpenAI API key from global_conf.yml if the user defined it."""
         if global_conf.get("OPENAI_API_KEY", None):
             os.environ["OPENAI_API_KEY"] = global_conf["OPENAI_API_KEY"]
 
-    def _setup_chat_openai(self, callbacks=None):
+    def _setup_chat_openai(self, callbacks=None) -> BaseChatModel:
+        """Create the chat model of the selected backend (`LLM_BACKEND`)."""
+        if global_conf["LLM_BACKEND"] == "fake":
+            return FakeChatModel.from_files(
+                fixture_path=global_conf["POKEAPI_FIXTURE_PATH"],
+                labeled_queries_path=global_conf["INTENT_CLASSIFIER_DATA_PATH"],
+                callbacks=callbacks,
+                cache=True if self.llm_cache else None,
+            )
         openai.api_key = os.environ.get("OPENAI_API_KEY")
         return ChatOpenAI(
             temperature=global_conf["MODEL_CREATIVITY"],
             model_name=global_conf["MODEL_NAME"],
             callbacks=callbacks,
+            cache=True if self.llm_cache else None,
         )
+
+    def _setup_embeddings(self) -> Embeddings:
+        """Create the embedding model of the selected backend (`EMBEDDINGS_BACKEND`),
+        shared by the indexing process, the retriever and the semantic cache."""
+        if global_conf["EMBEDDINGS_BACKEND"] == "hashing":
+            return HashingEmbeddings(size=global_conf["HASHING_EMBEDDINGS_SIZE"])
+        return OpenAIEmbeddings()
@@ -0,0 +1,247 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+import numpy as np
+from datetime import datetime, timezone
+from typing import Awaitable, Dict, Iterator, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_core.globals import get_llm_cache, set_llm_cache
+from agents.information_retrieval_agent import aapi_retrieval_agent
+from agents.rag_qa_agent import aretrieval_qa_agent
+from retrieval_system.indexing_process import _index_vector_store, _read_manifest
+from src.common.llm_cache import DisabledLLMCache
+from src.intent_handler import IntentHandler
+from tools.pokeapi_client import parse_pokemon, pokeapi_client
+from setup_loader import SetupLoader
+
+app_setup = SetupLoader()
+logger, global_conf, embeddings = (
+    app_setup.logger,
+    app_setup.global_conf,
+    app_setup.embeddings,
+)
+
+
+def _read_queries(path: str) -> List[str]:
+    """Read the benchmark queries, one JSON object per line with the `query`.
+    Args:
+        path (str): Path of the JSON lines file.
+    Returns:
+        List[str]: Queries.
+    """
+    with open(path, "r") as file:
+        return [json.loads(line)["query"] for line in file if line.strip()]
+
+
+def _fixture_pages() -> Iterator[Document]:
+    """Build one Pokédex page per Pokémon of the PokeAPI fixture, with the entry
+    header of the source files (e.g. "006. CHARIZARD") so the name index is built.
+    Returns:
+        Iterator[Document]: Pages of the fixture.
+    """
+    fixture_path = global_conf["POKEAPI_FIXTURE_PATH"]
+    with open(fixture_path, "r") as file:
+        fixture = json.load(file)["pokemon"]
+    for page, pokemon_data in enumerate(fixture):
+        info, name = parse_pokemon(pokemon_data), pokemon_data["name"]
+        stats = ", ".join(f"{stat} {value}" for stat, value in info["stats"].items())
+        yield Document(
+            page_content=(
+                f"{info['id']:03d}. {name.upper()}\n"
+                f"{name.capitalize()} is a {'/'.join(info['types'])} type Pokémon, "
+                f"{info['height'] / 10} m tall and weighing {info['weight'] / 10} kg. "
+                f"Abilities: {', '.join(info['abilities'])}. Base stats: {stats}."
+            ),
+            metadata={"source": fixture_path, "page": page},
+        )
+
+
+def _prepare_index() -> None:
+    """Index the fixture pages when the offline embeddings are used and there is no
+    index yet, an index built with another embedding model is never overwritten.
+    Raises:
+        ValueError: The index was built with another embedding model.
+    """
+    manifest = _read_manifest()
+    if manifest is not None and manifest["embedding_model"] != embeddings.model:
+        raise ValueError(
+            f"The vector store was built with '{manifest['embedding_model']}', set a "
+            f"separate VECTOR_STORE_PATH for '{embeddings.model}'"
+        )
+    if manifest is None and global_conf["EMBEDDINGS_BACKEND"] == "hashing":
+        logger.info("Indexing the PokeAPI fixture for the offline embeddings")
+        _index_vector_store(pages=_fixture_pages())
+
+
+async def _timed(awaitable: Awaitable) -> Tuple[float, object]:
+    """Await and time a coroutine.
+    Args:
+        awaitable (Awaitable): Coroutine to await.
+    Returns:
+        Tuple[float, object]: Elapsed seconds and result.
+    """
+    start = time.perf_counter()
+    result = await awaitable
+    return time.perf_counter() - start, result
+
+
+async def _run_query(query: str) -> Tuple[Dict[str, float], str, float, bool]:
+    """Time the stages of a query one by one, then its branch end to end.
+    Args:
+        query (str): User query.
+    Returns:
+        Tuple[Dict[str, float], str, float, bool]: Elapsed seconds per stage, branch
+        (intent type and structure), elapsed seconds of the branch and error flag.
+    """
+    stages = {}
+    handler = IntentHandler(user_input=query)
+    stages["stage_0_tagging"], intent = await _timed(handler._atag_intent())
+    if intent.intent_type is not None and handler._needs_user_entities(intent):
+        handler.response_template.intent_structure = intent.intent_structure
+        stages["stage_1_extraction"], entities = await _timed(
+            handler._aextract_entities(query)
+        )
+        if entities.name_list:
+            stages["stage_2_api"], _ = await _timed(
+                aapi_retrieval_agent(
+                    pokemon_entity_list=entities,
+                    prompt="stage_2_information_api_search_template",
+                )
+            )
+            stages["stage_3_rag"], _ = await _timed(
+                aretrieval_qa_agent(
+                    user_query="stage_3_query_template",
+                    qa_prompt="stage_3_retrieval_qa_template",
+                    pokemon_list=entities.name_list,
+                )
+            )
+
+    handler = IntentHandler(user_input=query)
+    elapsed, response_template = await _timed(handler.arun())
+    branch = f"{response_template.intent_type}/{response_template.intent_structure}"
+    return stages, branch, elapsed, response_template.error
+
+
+def _summarize(samples: List[float]) -> Dict[str, float]:
+    """Latency statistics in milliseconds.
+    Args:
+        samples (List[float]): Elapsed seconds.
+    Returns:
+        Dict[str, float]: Number of samples, mean, p50, p95, min and max.
+    """
+    milliseconds = np.asarray(samples) * 1000
+    return {
+        "n": len(samples),
+        "mean_ms": round(float(milliseconds.mean()), 3),
+        "p50_ms": round(float(np.percentile(milliseconds, 50)), 3),
+        "p95_ms": round(float(np.percentile(milliseconds, 95)), 3),
+        "min_ms": round(float(milliseconds.min()), 3),
+        "max_ms": round(float(milliseconds.max()), 3),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    """Current commit of the repository, to track the results per commit."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def benchmark(queries: List[str], repeat: int = 5, warmup: int = 1) -> Dict:
+    """Time each stage and each `IntentHandler` branch over the queries. The LLM
+    cache is disabled while measuring (it is kept on disk across runs and commits, so
+    the stages would time its lookups), and the PokeAPI memory cache starts empty.
+    Args:
+        queries (List[str]): User queries.
+        repeat (int, optional): Measured runs over the queries. Defaults to 5.
+        warmup (int, optional): Runs discarded first (index load, chain building).
+        Defaults to 1.
+    Returns:
+        Dict: Latency statistics per stage and per branch, with the commit and the
+        backends used.
+    """
+    _prepare_index()
+    stage_samples: Dict[str, List[float]] = {}
+    branch_samples: Dict[str, List[float]] = {}
+    errors = 0
+    llm_cache = get_llm_cache()
+    if llm_cache is not None:
+        set_llm_cache(DisabledLLMCache())
+    pokeapi_client.clear_cache()
+    try:
+        for run in range(warmup + repeat):
+            for query in queries:
+                stages, branch, elapsed, error = await _run_query(query)
+                if run < warmup:
+                    continue
+                for stage, stage_elapsed in stages.items():
+                    stage_samples.setdefault(stage, []).append(stage_elapsed)
+                branch_samples.setdefault(branch, []).append(elapsed)
+                errors += error
+    finally:
+        set_llm_cache(llm_cache)
+        await pokeapi_client.aclose()
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "backends": {
+            "llm": global_conf["LLM_BACKEND"],
+            "embeddings": global_conf["EMBEDDINGS_BACKEND"],
+            "pokeapi": global_conf["POKEAPI_BACKEND"],
+            "llm_cache": "disabled",
+            "pokeapi_cache": {
+                "memory": "cleared at start",
+                "ttl": global_conf["POKEAPI_CACHE_TTL"],
+                "disk_path": global_conf.get("POKEAPI_CACHE_DISK_PATH"),
+            },
+        },
+        "queries": len(queries),
+        "repeat": repeat,
+        "warmup": warmup,
+        "errors": errors,
+        "stages": {
+            stage: _summarize(samples)
+            for stage, samples in sorted(stage_samples.items())
+        },
+        "branches": {
+            branch: _summarize(samples)
+            for branch, samples in sorted(branch_samples.items())
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline stage benchmark")
+    parser.add_argument(
+        "--queries",
+        default=global_conf["BENCHMARK_QUERIES_PATH"],
+        help="Benchmark queries (JSON lines)",
+    )
+    parser.add_argument(
+        "--output",
+        default=global_conf["BENCHMARK_RESULTS_PATH"],
+        help="JSON file to write the results to",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Measured runs")
+    parser.add_argument("--warmup", type=int, default=1, help="Discarded runs")
+    args = parser.parse_args()
+
+    results = asyncio.run(
+        benchmark(_read_queries(args.queries), repeat=args.repeat, warmup=args.warmup)
+    )
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    logger.info(f"Benchmark results written to '{args.output}'")
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+
+class SQLiteLRUCache(BaseCache):
+    """Exact-match cache of LLM responses stored in SQLite, with a size limit and
+    least recently used eviction. Entries are keyed on the rendered prompt (messages)
+    and the LLM string, which serializes the model name, temperature and the bound
+    function schemas, so only identical requests share an answer.
+    Attributes:
+        path (str): Path of the SQLite database.
+        max_entries (int): Maximum number of entries.
+        hits (int): Number of lookups served by the cache.
+        misses (int): Number of lookups not served by the cache.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, "
+                "response TEXT NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS llm_cache_last_access "
+                "ON llm_cache (last_access)"
+            )
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        """Hash of the prompt and the LLM configuration."""
+        return hashlib.sha256(f"{llm_string}\n{prompt}".encode()).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """Read the cached generations of a request.
+        Args:
+            prompt (str): Serialized prompt.
+            llm_string (str): Serialized LLM configuration.
+        Returns:
+            Optional[RETURN_VAL_TYPE]: Cached generations, or None on miss.
+        """
+        key = self._key(prompt, llm_string)
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT response FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._connection.execute(
+                "UPDATE llm_cache SET last_access = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            self.hits += 1
+        return loads(row[0])
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """Write the generations of a request, evicting the least recently used
+        entries when the cache is full.
+        Args:
+            prompt (str): Serialized prompt.
+            llm_string (str): Serialized LLM configuration.
+            return_val (RETURN_VAL_TYPE): Generations to cache.
+        """
+        key = self._key(prompt, llm_string)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, last_access) "
+                "VALUES (?, ?, ?)",
+                (key, dumps(return_val), time.time()),
+            )
+            self._connection.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache "
+                "ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self, **kwargs: Any) -> None:
+        """Remove every entry and reset the counters."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM llm_cache")
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters.
+        Returns:
+            Dict[str, Any]: Hits, misses, hit rate and current size.
+        """
+        with self._lock:
+            size = self._connection.execute(
+                "SELECT COUNT(*) FROM llm_cache"
+            ).fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": size,
+        }
+
+
+class DisabledLLMCache(BaseCache):
+    """Cache that never stores nor serves a response, registered in place of the
+    LLM cache to measure the uncached latency (e.g. in the benchmark) while the chat
+    model is still configured with `cache=True`.
+    """
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        pass
+
+    def clear(self, **kwargs: Any) -> None:
+        pass
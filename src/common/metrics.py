@@ -0,0 +1,130 @@
+import asyncio
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator
+from prometheus_client import REGISTRY, Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+
+# Upper bounds (seconds) of the latency buckets, from a local classifier answer to a
+# multi-Pokémon RAG answer
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Pipeline stage of the running code, read by the callback handler to label the LLM
+# requests (context variables are copied into the tasks and threads a stage starts)
+current_stage: ContextVar[str] = ContextVar("current_stage", default="other")
+
+
+class CacheCollector:
+    """Prometheus collector of the hits, misses and size of the caches. Caches are
+    registered with their `stats` function and read at scrape time, so their lookups
+    are not slowed down.
+    """
+
+    def __init__(self):
+        self._caches: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def register_cache(self, cache: str, stats: Callable[[], Dict[str, Any]]) -> None:
+        """Expose the counters of a cache.
+        Args:
+            cache (str): Cache name (`cache` label).
+            stats (Callable[[], Dict[str, Any]]): Function returning the `hits`,
+            `misses` and `size` counters of the cache.
+        """
+        with self._lock:
+            self._caches[cache] = stats
+
+    def collect(self) -> Iterator[Metric]:
+        """Read the counters of the registered caches.
+        Returns:
+            Iterator[Metric]: Hits, misses and size metrics labeled by cache.
+        """
+        with self._lock:
+            caches = sorted(self._caches.items())
+        hits = CounterMetricFamily(
+            "pokemon_assistant_cache_hits",
+            "Lookups served by the cache.",
+            labels=["cache"],
+        )
+        misses = CounterMetricFamily(
+            "pokemon_assistant_cache_misses",
+            "Lookups not served by the cache.",
+            labels=["cache"],
+        )
+        size = GaugeMetricFamily(
+            "pokemon_assistant_cache_size",
+            "Entries currently in the cache.",
+            labels=["cache"],
+        )
+        for cache, read_stats in caches:
+            stats = read_stats()
+            hits.add_metric([cache], stats["hits"])
+            misses.add_metric([cache], stats["misses"])
+            size.add_metric([cache], stats["size"])
+        yield from (hits, misses, size)
+
+
+cache_collector = CacheCollector()
+REGISTRY.register(cache_collector)
+stage_duration = Histogram(
+    "pokemon_assistant_stage_duration_seconds",
+    "Seconds spent in each pipeline stage.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+llm_request_duration = Histogram(
+    "pokemon_assistant_llm_request_duration_seconds",
+    "Seconds per LLM request, by the pipeline stage that sent it.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+llm_tokens = Counter(
+    "pokemon_assistant_llm_tokens",
+    "LLM tokens by pipeline stage and type (prompt or completion).",
+    ["stage", "type"],
+)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a pipeline stage, the LLM requests sent inside are labeled with it.
+    Args:
+        stage (str): Stage name (e.g. "tagging").
+    """
+    token = current_stage.set(stage)
+    try:
+        with stage_duration.labels(stage=stage).time():
+            yield
+    finally:
+        current_stage.reset(token)
+
+
+def traced(stage: str) -> Callable[[Callable], Callable]:
+    """Decorator timing every call of a function (or coroutine function) as a span
+    of the pipeline stage.
+    Args:
+        stage (str): Stage name (e.g. "tagging").
+    Returns:
+        Callable[[Callable], Callable]: Decorator.
+    """
+
+    def decorator(function: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def awrapper(*args, **kwargs):
+                with span(stage):
+                    return await function(*args, **kwargs)
+
+            return awrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,260 @@
+import json
+import re
+import zlib
+import numpy as np
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+INTENT_FUNCTIONS = ("IntentTagger", "IntentEntityTagger")
+DEFENSE_KEYWORDS = ("beat", "counter", "against", "defeat", "defend", "fight")
+SQUAD_KEYWORDS = ("squad", "team")
+
+
+@lru_cache(maxsize=8)
+def _get_gazetteer(names: Tuple[str, ...]) -> Any:
+    """Matcher of the fixture Pokémon names, built once per set of names. Imported on
+    first use since the parsers depend on the `SetupLoader` creating the model.
+    Args:
+        names (Tuple[str, ...]): Pokémon names.
+    Returns:
+        PokemonGazetteer: Matcher of the names.
+    """
+    from parsers.gazetteer_parser import PokemonGazetteer
+
+    return PokemonGazetteer(names=list(names))
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic stand-in of the chat model (`LLM_BACKEND: "fake"`), it answers
+    every chain of the pipeline without network, so the pipeline overhead can be
+    measured and regression-tested:
+    - `IntentTagger` / `IntentEntityTagger`: labels of the query when it is one of
+    the labeled queries, otherwise keyword rules.
+    - `PokemonEntityList` and the tools: Pokémon names of the fixture matched in the
+    input.
+    - Free text (RAG, no intent): the name of a fixture Pokémon the prompt doesn't
+    mention, picked by hash of the prompt (a valid answer of the defensive prompts).
+    Attributes:
+        pokemon_names (List[str]): Pokémon names known by the model.
+        labeled_queries (Dict[str, Dict[str, str]]): Intent labels by query.
+    """
+
+    pokemon_names: List[str] = []
+    labeled_queries: Dict[str, Dict[str, str]] = {}
+
+    @classmethod
+    def from_files(
+        cls, fixture_path: str, labeled_queries_path: str, **kwargs: Any
+    ) -> "FakeChatModel":
+        """Create the model from the PokeAPI fixture and the labeled queries.
+        Args:
+            fixture_path (str): PokeAPI stand-in JSON file (`pokemon` list).
+            labeled_queries_path (str): Labeled queries (JSON lines).
+            **kwargs (Any): Chat model parameters (e.g. callbacks).
+        Returns:
+            FakeChatModel: Chat model.
+        """
+        with open(fixture_path, "r") as file:
+            pokemon_names = [pokemon["name"] for pokemon in json.load(file)["pokemon"]]
+        with open(labeled_queries_path, "r") as file:
+            labeled_queries = {
+                query["query"]: query
+                for query in (json.loads(line) for line in file if line.strip())
+            }
+        return cls(
+            pokemon_names=pokemon_names, labeled_queries=labeled_queries, **kwargs
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def _match_names(self, text: str) -> List[str]:
+        """Pokémon names of the fixture mentioned in a text, in order."""
+        gazetteer = _get_gazetteer(tuple(self.pokemon_names))
+        return [entity.name for entity in gazetteer.extract(text).name_list]
+
+    def _tag(self, text: str) -> Dict[str, str]:
+        """Tag the intent type and structure of a user input.
+        Args:
+            text (str): User input.
+        Returns:
+            Dict[str, str]: `IntentTagger` arguments.
+        """
+        label = self.labeled_queries.get(text.strip())
+        if label is not None:
+            return {key: label[key] for key in ("intent_type", "intent_structure")}
+
+        lowered, names = text.lower(), self._match_names(text)
+        if not names and not re.search(r"pok[eé]mon", lowered):
+            intent_type, intent_structure = "None", "None"
+        elif any(keyword in lowered for keyword in SQUAD_KEYWORDS):
+            intent_type, intent_structure = "squad_build", "pokemon_names"
+        elif any(keyword in lowered for keyword in DEFENSE_KEYWORDS):
+            intent_type, intent_structure = "defense_suggestion", "pokemon_names"
+        elif not names:
+            intent_type = "information_request"
+            intent_structure = "natural_language_description"
+        else:
+            intent_type = "information_request"
+            intent_structure = (
+                "natural_language_question" if "?" in text else "pokemon_names"
+            )
+        return {"intent_type": intent_type, "intent_structure": intent_structure}
+
+    def _text_answer(self, prompt: str) -> str:
+        """Answer a free text prompt with a Pokémon name it doesn't mention.
+        Args:
+            prompt (str): Whole prompt.
+        Returns:
+            str: Pokémon name, `None` when the model knows no Pokémon.
+        """
+        mentioned = set(self._match_names(prompt))
+        candidates = [name for name in self.pokemon_names if name not in mentioned]
+        candidates = candidates or self.pokemon_names
+        if not candidates:
+            return "None"
+        return candidates[zlib.crc32(prompt.encode()) % len(candidates)].capitalize()
+
+    def _answer(
+        self,
+        messages: List[BaseMessage],
+        functions: Optional[List[Dict[str, Any]]] = None,
+        function_call: Optional[Dict[str, str]] = None,
+        **kwargs: Any,
+    ) -> AIMessage:
+        """Answer the messages, with a function call when functions are bound.
+        Args:
+            messages (List[BaseMessage]): Prompt messages.
+            functions (Optional[List[Dict[str, Any]]], optional): Bound functions.
+            Defaults to None.
+            function_call (Optional[Dict[str, str]], optional): Forced function.
+            Defaults to None.
+        Returns:
+            AIMessage: Answer.
+        """
+        if not functions:
+            prompt = "\n".join(str(message.content) for message in messages)
+            return AIMessage(content=self._text_answer(prompt))
+
+        user_input = next(
+            (
+                str(message.content)
+                for message in reversed(messages)
+                if isinstance(message, HumanMessage)
+            ),
+            "",
+        )
+        name = function_call["name"] if function_call else functions[0]["name"]
+        names = self._match_names(user_input)
+        if name in INTENT_FUNCTIONS:
+            arguments: Dict[str, Any] = self._tag(user_input)
+            if name == "IntentEntityTagger":
+                arguments["name_list"] = [{"name": pokemon} for pokemon in names]
+        elif name == "PokemonEntityList":
+            arguments = {"name_list": [{"name": pokemon} for pokemon in names]}
+        else:  # Tools receive the Pokémon names (`ToolingEntry`)
+            arguments = {"name_list": names}
+        return AIMessage(
+            content="",
+            additional_kwargs={
+                "function_call": {"name": name, "arguments": json.dumps(arguments)}
+            },
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self._answer(messages, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return self._generate(messages, stop=stop, **kwargs)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        message = self._answer(messages, **kwargs)
+        if message.additional_kwargs:
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content="", additional_kwargs=message.additional_kwargs
+                )
+            )
+            return
+        for token in re.findall(r"\S+\s*", message.content):
+            if run_manager:
+                run_manager.on_llm_new_token(token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        for chunk in self._stream(messages, stop=stop, **kwargs):
+            if run_manager and chunk.text:
+                await run_manager.on_llm_new_token(chunk.text)
+            yield chunk
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic stand-in of the embedding model (`EMBEDDINGS_BACKEND:
+    "hashing"`), the words and character trigrams of a text are hashed into a
+    signed, L2 normalized vector, so similar texts get similar vectors without
+    network.
+    Attributes:
+        size (int): Size of the vectors.
+        model (str): Name of the model, used to key the index and embedding cache.
+    """
+
+    def __init__(self, size: int = 384):
+        self.size = size
+        self.model = f"hashing-{size}"
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        words = re.findall(r"\w+", text.lower())
+        grams = words + [
+            f" {word} "[i : i + 3] for word in words for i in range(len(word))
+        ]
+        for gram in grams:
+            hashed = zlib.crc32(gram.encode())
+            vector[hashed % self.size] += 1.0 if hashed & 1 << 31 else -1.0
+        return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
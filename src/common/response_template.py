@@ -1,6 +1,7 @@
 from dataclasses import dataclass, field
-from typing import Any, Dict
+from typing import Any, Dict, Iterator
 from conf.config_loader import default_messages
+from tools.type_chart import damage_relations
 from setup_loader import SetupLoader
 import random
 from textwrap import dedent
@@ -34,6 +35,8 @@ class ResponseTemplate:
         pokemon_descriptions (Dict[str, Any]): Pokémon descriptions.
         pokemon_squad_info (Dict[str, Any]): Pokémon squad information.
         response (Dict[str, Any]): Response.
+        header (str): Initial response, picked once so a streamed header matches
+        the final response.
     """
 
     error: bool = field(default=False)
@@ -46,6 +49,7 @@ class ResponseTemplate:
     pokemon_descriptions: Dict[str, Any] = field(default_factory=dict)
     pokemon_squad_info: Dict[str, Any] = field(default_factory=dict)
     response: Dict[str, Any] = field(default_factory=dict)
+    header: str = field(default_factory=str)
 
     @property
     def template_structure(self):
@@ -147,20 +151,87 @@ class ResponseTemplate:
         self.response["header"] = dedent(self.nlp_answer["answer"]) + "\n"
 
     def _pokemon_descriptions_template(self):
-        """Helper that populates the Pokémon descriptions template."""
-        listed_responses = list(self.pokemon_descriptions.values())
+        """Helper that populates the Pokémon descriptions template, each description
+        is appended to the card of its Pokémon (matched by name, a Pokémon missing
+        from the API information has no card)."""
+        names = list(self.pokemon_info) or list(self.pokemon_descriptions)
 
         if not self.response["body"]:
-            self.response["body"] = ["" for _ in range(len(listed_responses))]
+            self.response["body"] = ["" for _ in range(len(names))]
 
-        for i in range(len(self.pokemon_descriptions)):
-            self.response["body"][i] += "\n" + dedent(listed_responses[i]["answer"])
+        for i, name in enumerate(names):
+            description = self.pokemon_descriptions.get(name)
+            if description is not None:
+                self.response["body"][i] += "\n" + dedent(description["answer"])
+
+    def initial_header(self) -> str:
+        """Initial response from the chatbot, available as soon as the intent is
+        tagged.
+        Returns:
+            str: Header.
+        """
+        if not self.header:
+            self.header = dedent(
+                random.choice(list(default_messages["initial_responses"].values()))
+            )
+        return self.header
 
     def _header_template(self):
         """Helper that populates the header template."""
-        self.response["header"] = dedent(
-            random.choice(list(default_messages["initial_responses"].values()))
+        self.response["header"] = self.initial_header()
+
+    @staticmethod
+    def card(name: str, pokemon: Dict[str, Any]) -> Dict[str, Any]:
+        """Render the card of a single Pokémon, as shown in the response body.
+        Args:
+            name (str): Pokémon name.
+            pokemon (Dict[str, Any]): Pokémon information.
+        Returns:
+            Dict[str, Any]: Card with the Pokémon name, body text and sprite URLs.
+        """
+        body = dedent(default_messages["pokemon_info_template"]).format(
+            name=name,
+            id=pokemon["id"],
+            hp=pokemon["stats"]["hp"],
+            attack=pokemon["stats"]["attack"],
+            defense=pokemon["stats"]["defense"],
+            special_attack=pokemon["stats"]["special-attack"],
+            special_defense=pokemon["stats"]["special-defense"],
+            speed=pokemon["stats"]["speed"],
+            height=pokemon["height"] / 10,
+            weight=pokemon["weight"] / 10,
+            types=", ".join(pokemon["types"]),
+            abilities=", ".join(pokemon["abilities"]),
+            damage_relations="\n- ".join(
+                [
+                    f'{damage.replace("_", " ")}: {", ".join(types)}'
+                    for damage, types in damage_relations(pokemon["types"]).items()
+                ]
+            ),
         )
+        sprites = [url for url in pokemon["sprites"].values() if url]
+        return dict(name=name, body=body, sprites=sprites)
+
+    @staticmethod
+    def events(response: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Split a complete response into the events of the streaming API: the
+        header, one card per body entry and the final response.
+        Args:
+            response (Dict[str, Any]): Response template populated.
+        Returns:
+            Iterator[Dict[str, Any]]: Streaming events.
+        """
+        yield dict(event="header", data=response["header"])
+        sprites = response["sprites"] or {}
+        names = list(sprites)
+        for index, body in enumerate(response["body"] or []):
+            name = names[index] if index < len(names) else None
+            yield dict(
+                event="card",
+                index=index,
+                data=dict(name=name, body=body, sprites=sprites.get(name, [])),
+            )
+        yield dict(event="done", data=response)
 
     def _pokemon_info_template(
         self, defense: bool = False, squad_defense: bool = False
@@ -175,32 +246,10 @@ class ResponseTemplate:
         if defense:
             self.pokemon_info = self.pokemon_defense_info
 
-        body_list = [
-            dedent(default_messages["pokemon_info_template"]).format(
-                name=name,
-                id=pokemon["id"],
-                hp=pokemon["stats"]["hp"],
-                attack=pokemon["stats"]["attack"],
-                defense=pokemon["stats"]["defense"],
-                special_attack=pokemon["stats"]["special-attack"],
-                special_defense=pokemon["stats"]["special-defense"],
-                speed=pokemon["stats"]["speed"],
-                height=pokemon["height"] / 10,
-                weight=pokemon["weight"] / 10,
-                types=", ".join(pokemon["types"]),
-                abilities=", ".join(pokemon["abilities"]),
-                damage_relations="\n- ".join(
-                    [
-                        f'{damage.replace("_", " ")}: {value}'
-                        for damage, value in pokemon["damage_relations"].items()
-                    ]
-                ),
-            )
-            for name, pokemon in self.pokemon_info.items()
+        cards = [
+            self.card(name, pokemon) for name, pokemon in self.pokemon_info.items()
         ]
-        sprite_list = {
-            name: [url for url in value["sprites"].values() if url]
-            for name, value in self.pokemon_info.items()
-        }
+        body_list = [card["body"] for card in cards]
+        sprite_list = {card["name"]: card["sprites"] for card in cards}
         self.response["body"] = body_list
         self.response["sprites"] = sprite_list
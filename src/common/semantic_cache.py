@@ -0,0 +1,167 @@
+import copy
+import threading
+import time
+import numpy as np
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+from langchain_core.embeddings import Embeddings
+
+
+class SemanticCacheKey(NamedTuple):
+    """Key of a query in the semantic cache.
+    Attributes:
+        vector (np.ndarray): Normalized query embedding.
+        names (FrozenSet[str]): Pokémon names found in the query.
+    """
+
+    vector: np.ndarray
+    names: FrozenSet[str]
+
+
+class SemanticCache:
+    """In-memory cache of responses keyed on the meaning of the query, so paraphrases
+    of a previous query (e.g. "tell me about Pikachu" and "Pikachu info please") are
+    served without running the pipeline again. Queries are embedded and compared by
+    cosine similarity against a fixed-size matrix of past queries, entries expire after
+    a time-to-live and the least recently used one is evicted when full.
+    Queries that differ only by the Pokémon named (e.g. "tell me about Pikachu" and
+    "tell me about Raichu") embed almost identically, so each entry stores the names
+    found in its query (e.g. by the `PokemonGazetteer`), and is served only to queries
+    naming the same Pokémon.
+    Attributes:
+        embeddings (Embeddings): Model used to embed the queries.
+        extract_names (Optional[Callable[[str], Iterable[str]]]): Function returning
+        the Pokémon names found in a query, None to compare the embeddings only.
+        threshold (float): Minimum cosine similarity to serve a cached response.
+        ttl (float): Seconds an entry is valid.
+        max_entries (int): Maximum number of entries.
+        hits (int): Number of lookups served by the cache.
+        misses (int): Number of lookups not served by the cache.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        threshold: float = 0.97,
+        ttl: float = 3600,
+        max_entries: int = 512,
+        extract_names: Optional[Callable[[str], Iterable[str]]] = None,
+    ):
+        self.embeddings = embeddings
+        self.extract_names = extract_names
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._vectors = None  # (max_entries, dim), allocated on first insert
+        self._responses: List[Optional[Dict[str, Any]]] = [None] * max_entries
+        self._names: List[FrozenSet[str]] = [frozenset()] * max_entries
+        self._expires_at = np.zeros(max_entries)  # 0 = empty slot
+        self._last_used = np.zeros(max_entries)
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        """Unit vector of an embedding, so the dot product is the cosine similarity."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _names_in(self, query: str) -> FrozenSet[str]:
+        """Pokémon names found in a query, empty without name extractor."""
+        if self.extract_names is None:
+            return frozenset()
+        return frozenset(self.extract_names(query))
+
+    def _search(self, key: SemanticCacheKey) -> Optional[Dict[str, Any]]:
+        """Find the response of the most similar live entry above the threshold, among
+        the entries naming the same Pokémon as the query.
+        Args:
+            key (SemanticCacheKey): Query embedding and names.
+        Returns:
+            Optional[Dict[str, Any]]: Copy of the cached response, or None on miss.
+        """
+        with self._lock:
+            now = time.monotonic()
+            live = self._expires_at > now
+            live &= np.fromiter(
+                (names == key.names for names in self._names), bool, self.max_entries
+            )
+            if self._vectors is None or not live.any():
+                self.misses += 1
+                return None
+            similarities = np.where(live, self._vectors @ key.vector, -1.0)
+            slot = int(similarities.argmax())
+            if similarities[slot] < self.threshold:
+                self.misses += 1
+                return None
+            self._last_used[slot] = now
+            self.hits += 1
+            return copy.deepcopy(self._responses[slot])
+
+    def lookup(
+        self, query: str
+    ) -> Tuple[SemanticCacheKey, Optional[Dict[str, Any]]]:
+        """Embed a query and search for the response of a similar one.
+        Args:
+            query (str): User query.
+        Returns:
+            Tuple[SemanticCacheKey, Optional[Dict[str, Any]]]: Query key (to be passed
+            to `add` on miss), and the cached response or None.
+        """
+        vector = self._normalize(self.embeddings.embed_query(query))
+        key = SemanticCacheKey(vector, self._names_in(query))
+        return key, self._search(key)
+
+    async def alookup(
+        self, query: str
+    ) -> Tuple[SemanticCacheKey, Optional[Dict[str, Any]]]:
+        """Asynchronous version of `lookup`."""
+        vector = self._normalize(await self.embeddings.aembed_query(query))
+        key = SemanticCacheKey(vector, self._names_in(query))
+        return key, self._search(key)
+
+    def add(self, key: SemanticCacheKey, response: Dict[str, Any]) -> None:
+        """Cache the response of a query, replacing an expired entry or the least
+        recently used one when full.
+        Args:
+            key (SemanticCacheKey): Query key, as returned by `lookup`.
+            response (Dict[str, Any]): Response to cache.
+        """
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros(
+                    (self.max_entries, key.vector.shape[0]), dtype=np.float32
+                )
+            now = time.monotonic()
+            expired = np.flatnonzero(self._expires_at <= now)
+            slot = int(expired[0]) if expired.size else int(self._last_used.argmin())
+            self._vectors[slot] = key.vector
+            self._responses[slot] = copy.deepcopy(response)
+            self._names[slot] = key.names
+            self._expires_at[slot] = now + self.ttl
+            self._last_used[slot] = now
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters.
+        Returns:
+            Dict[str, Any]: Hits, misses, hit rate and current size.
+        """
+        with self._lock:
+            size = int((self._expires_at > time.monotonic()).sum())
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": size,
+        }
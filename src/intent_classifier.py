@@ -0,0 +1,309 @@
+import argparse
+import json
+import os
+import re
+import time
+import zlib
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from agents.pydantic_agent import get_intent_chain
+from parsers.intent_output_parser import IntentTagger
+from setup_loader import SetupLoader
+
+app_setup = SetupLoader()
+logger, global_conf = app_setup.logger, app_setup.global_conf
+
+LABELS = ("intent_type", "intent_structure")
+
+
+def _read_queries(path: str) -> List[Dict[str, str]]:
+    """Read a labeled query file, one JSON object per line with the `query`, and
+    its `intent_type` and `intent_structure` (`"None"` when there is no intent).
+    Args:
+        path (str): Path of the JSON lines file.
+    Returns:
+        List[Dict[str, str]]: Labeled queries.
+    """
+    with open(path, "r") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def _split_queries(
+    queries: List[Dict[str, str]], holdout: float
+) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+    """Split the labeled queries into a training and a held-out part, stratified by
+    label so every intent is evaluated. The split is stable (by hash of the query),
+    so `train` and `benchmark` agree on it without storing it.
+    Args:
+        queries (List[Dict[str, str]]): Labeled queries, see `_read_queries`.
+        holdout (float): Share of the queries of each label held out, 0 to train
+        on every query.
+    Returns:
+        Tuple[List[Dict[str, str]], List[Dict[str, str]]]: Training and held-out
+        queries.
+    """
+    groups: Dict[Tuple[str, ...], List[Dict[str, str]]] = {}
+    for query in queries:
+        groups.setdefault(tuple(query[label] for label in LABELS), []).append(query)
+
+    train, held_out = [], []
+    for group in groups.values():
+        group = sorted(group, key=lambda query: zlib.crc32(query["query"].encode()))
+        n_held_out = round(len(group) * holdout)
+        if holdout > 0 and len(group) > 1:
+            n_held_out = min(max(n_held_out, 1), len(group) - 1)
+        held_out.extend(group[:n_held_out])
+        train.extend(group[n_held_out:])
+    return train, held_out
+
+
+class IntentClassifier:
+    """CPU-only intent tagger, a linear model (softmax regression) over hashed word
+    and character n-grams with one head for each label of `IntentTagger`. It answers
+    in about a millisecond, so the Stage 0 LLM call is only required when the
+    model is not confident.
+    Attributes:
+        n_features (int): Size of the hashed feature space.
+        classes (Dict[str, List[str]]): Classes of each label.
+        weights (Dict[str, np.ndarray]): Weights of each label, shape
+        (n_features + 1, n_classes), the last row is the bias.
+    """
+
+    def __init__(
+        self,
+        n_features: int = 2**16,
+        classes: Dict[str, List[str]] = None,
+        weights: Dict[str, np.ndarray] = None,
+    ):
+        self.n_features = n_features
+        self.classes = classes or {}
+        self.weights = weights or {}
+
+    def _features(self, texts: List[str]) -> np.ndarray:
+        """Hash the word unigrams and bigrams, and the character 3-5 grams of each
+        text (with a stable hash, so trained models can be reloaded).
+        Args:
+            texts (List[str]): Texts to featurize.
+        Returns:
+            np.ndarray: L2 normalized features with a bias column, shape
+            (len(texts), n_features + 1).
+        """
+        features = np.zeros((len(texts), self.n_features + 1), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"\w+", text.lower())
+            grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            padded = f" {' '.join(words)} "
+            grams += [
+                padded[i : i + n]
+                for n in (3, 4, 5)
+                for i in range(len(padded) - n + 1)
+            ]
+            for gram in grams:
+                features[row, zlib.crc32(gram.encode()) % self.n_features] += 1.0
+            features[row] /= np.linalg.norm(features[row]) or 1.0
+        features[:, -1] = 1.0
+        return features
+
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def fit(
+        self,
+        queries: List[Dict[str, str]],
+        epochs: int = 300,
+        learning_rate: float = 1.0,
+        l2: float = 1e-4,
+    ) -> "IntentClassifier":
+        """Train both heads with full batch gradient descent.
+        Args:
+            queries (List[Dict[str, str]]): Labeled queries, see `_read_queries`.
+            epochs (int, optional): Gradient descent steps. Defaults to 300.
+            learning_rate (float, optional): Step size. Defaults to 1.0.
+            l2 (float, optional): L2 regularization. Defaults to 1e-4.
+        Returns:
+            IntentClassifier: Trained classifier.
+        """
+        features = self._features([query["query"] for query in queries])
+        for label in LABELS:
+            self.classes[label] = sorted({query[label] for query in queries})
+            targets = np.eye(len(self.classes[label]), dtype=np.float32)[
+                [self.classes[label].index(query[label]) for query in queries]
+            ]
+            weights = np.zeros(
+                (features.shape[1], len(self.classes[label])), dtype=np.float32
+            )
+            for _ in range(epochs):
+                probabilities = self._softmax(features @ weights)
+                gradient = features.T @ (probabilities - targets) / len(queries)
+                weights -= learning_rate * (gradient + l2 * weights)
+            self.weights[label] = weights
+        return self
+
+    def predict_proba(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """Class probabilities of each label.
+        Args:
+            texts (List[str]): Texts to classify.
+        Returns:
+            Dict[str, np.ndarray]: Probabilities of each label, shape
+            (len(texts), n_classes).
+        """
+        features = self._features(texts)
+        return {
+            label: self._softmax(features @ self.weights[label]) for label in LABELS
+        }
+
+    def predict(self, text: str) -> Tuple[IntentTagger, float]:
+        """Tag the intent type and structure of a text.
+        Args:
+            text (str): Text to classify.
+        Returns:
+            Tuple[IntentTagger, float]: Intent type and structure, and the confidence
+            of the prediction (lowest probability of both labels).
+        """
+        probabilities = self.predict_proba([text])
+        predicted = {
+            label: self.classes[label][int(probabilities[label][0].argmax())]
+            for label in LABELS
+        }
+        confidence = min(float(probabilities[label][0].max()) for label in LABELS)
+        return IntentTagger(**predicted), confidence
+
+    def save(self, path: str) -> None:
+        """Save the trained model as a NumPy archive.
+        Args:
+            path (str): Path of the `.npz` file.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(
+            path,
+            n_features=self.n_features,
+            classes=json.dumps(self.classes),
+            **{f"weights_{label}": self.weights[label] for label in LABELS},
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        """Load a model saved with `save`.
+        Args:
+            path (str): Path of the `.npz` file.
+        Returns:
+            IntentClassifier: Trained classifier.
+        """
+        with np.load(path) as archive:
+            return cls(
+                n_features=int(archive["n_features"]),
+                classes=json.loads(str(archive["classes"])),
+                weights={label: archive[f"weights_{label}"] for label in LABELS},
+            )
+
+
+def load_intent_classifier() -> Optional[IntentClassifier]:
+    """Load the trained intent classifier if it is enabled.
+    Returns:
+        Optional[IntentClassifier]: Trained classifier, or None if disabled or not
+        trained yet (`make train_intent_classifier`).
+    """
+    path = global_conf["INTENT_CLASSIFIER_MODEL_PATH"]
+    if not global_conf["LOCAL_INTENT_CLASSIFIER"]:
+        return None
+    if not os.path.exists(path):
+        logger.info(f"Intent classifier not found at '{path}', using the LLM tagger")
+        return None
+    return IntentClassifier.load(path)
+
+
+def benchmark(classifier: IntentClassifier, queries: List[Dict[str, str]]) -> Dict:
+    """Compare the classifier with the LLM tagger (Stage 0) on labeled queries, they
+    must not have been used to train the classifier (held-out queries), otherwise
+    the agreement is the training accuracy.
+    Args:
+        classifier (IntentClassifier): Trained classifier.
+        queries (List[Dict[str, str]]): Held-out labeled queries, see
+        `_read_queries`.
+    Returns:
+        Dict: Coverage (share of confident predictions), agreement of the confident
+        predictions with the LLM and with the labels, and latencies in seconds.
+    """
+    intent_chain = get_intent_chain()
+    threshold = global_conf["INTENT_CLASSIFIER_THRESHOLD"]
+    confident, agree_llm, agree_label = 0, 0, 0
+    local_latency, llm_latency, saved_latency = 0.0, 0.0, 0.0
+    for query in queries:
+        start = time.perf_counter()
+        prediction, confidence = classifier.predict(query["query"])
+        local_latency += time.perf_counter() - start
+
+        start = time.perf_counter()
+        llm_output = intent_chain.invoke({"input": query["query"]})
+        elapsed = time.perf_counter() - start
+        llm_latency += elapsed
+
+        if confidence < threshold:
+            continue
+        confident += 1
+        saved_latency += elapsed
+        agree_llm += all(
+            getattr(prediction, label) == str(getattr(llm_output, label))
+            for label in LABELS
+        )
+        agree_label += all(
+            getattr(prediction, label) == query[label] for label in LABELS
+        )
+
+    return {
+        "queries": len(queries),
+        "threshold": threshold,
+        "coverage": confident / len(queries),
+        "agreement_with_llm": agree_llm / confident if confident else None,
+        "agreement_with_labels": agree_label / confident if confident else None,
+        "mean_local_latency": local_latency / len(queries),
+        "mean_llm_latency": llm_latency / len(queries),
+        "total_latency_saved": saved_latency,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local intent classifier")
+    parser.add_argument("command", choices=["train", "benchmark"])
+    parser.add_argument(
+        "--data",
+        default=global_conf["INTENT_CLASSIFIER_DATA_PATH"],
+        help="Labeled queries (JSON lines)",
+    )
+    parser.add_argument(
+        "--model",
+        default=global_conf["INTENT_CLASSIFIER_MODEL_PATH"],
+        help="Model file to write (train) or read (benchmark)",
+    )
+    parser.add_argument(
+        "--holdout",
+        type=float,
+        default=global_conf["INTENT_CLASSIFIER_HOLDOUT"],
+        help="Share of the --data queries held out of training for the benchmark",
+    )
+    parser.add_argument(
+        "--eval-data",
+        default=None,
+        help="Held-out labeled queries (JSON lines) to benchmark on instead of the "
+        "held-out part of --data",
+    )
+    args = parser.parse_args()
+
+    train_queries, held_out_queries = _split_queries(
+        _read_queries(args.data), holdout=args.holdout
+    )
+    if args.command == "train":
+        IntentClassifier().fit(train_queries).save(args.model)
+        logger.info(
+            f"Intent classifier trained on {len(train_queries)} queries, "
+            f"{len(held_out_queries)} held out"
+        )
+    else:
+        if args.eval_data is not None:
+            held_out_queries = _read_queries(args.eval_data)
+        if not held_out_queries:
+            parser.error("No held-out queries, set --holdout or --eval-data")
+        results = benchmark(IntentClassifier.load(args.model), held_out_queries)
+        logger.info(f"Intent classifier benchmark:\n{json.dumps(results, indent=2)}")
@@ -1,15 +1,32 @@
-from dataclasses import dataclass, field
-from langchain_core.runnables import RunnableSequence
+import asyncio
+from dataclasses import dataclass, field, replace
+from typing import Any, AsyncIterator, Coroutine, Dict, List, Optional
+from langchain_core.runnables import RunnableLambda, RunnableParallel, RunnableSequence
+from parsers.gazetteer_parser import PokemonGazetteer
 from parsers.info_output_parser import PokemonEntity, PokemonEntityList
-from agents.information_retrieval_agent import api_retrieval_agent
+from parsers.intent_output_parser import IntentTagger, IntentEntityTagger
+from agents.information_retrieval_agent import (
+    api_retrieval_agent,
+    aapi_retrieval_agent,
+)
 from agents.rag_qa_agent import (
     retrieval_qa_agent,
+    aretrieval_qa_agent,
     defensive_qa_agent,
-    _get_retrieval_qa_chain,
+    adefensive_qa_agent,
+    astream_retrieval_qa_agent,
+    qa_agent,
+    aqa_agent,
+    _get_pokemon_queries,
 )
+from src.common.metrics import span, traced
 from src.common.response_template import ResponseTemplate
+from src.intent_classifier import load_intent_classifier
+from retrieval_system.retriever_registry import RetrieverRegistry
+from tools.tools import pokedex_store
 from agents.pydantic_agent import (
     get_intent_chain,
+    get_intent_entity_chain,
     get_pokemon_entity_chain,
     get_no_intent_chain,
 )
@@ -24,6 +41,45 @@ base_llm, logger, global_conf, prompt_template_library = (
 )
 
 
+
+def load_pokemon_gazetteer() -> PokemonGazetteer:
+    """Create the matcher of the Pokémon names known locally, from the local Pokédex
+    store (`make import_pokedex`) and the name index of the vector store.
+    Returns:
+        PokemonGazetteer: Matcher of the names, matching nothing if none is known.
+    """
+    names = dict.fromkeys(pokedex_store.names() + RetrieverRegistry().indexed_names())
+    if not names:
+        logger.warning(
+            "No Pokémon names known locally (import the Pokédex or index the source "
+            "files), the names are only extracted by the LLM and the semantic cache "
+            "doesn't tell queries about different Pokémon apart"
+        )
+    return PokemonGazetteer(names=names)
+
+
+# Built once at startup
+pokemon_gazetteer = (
+    load_pokemon_gazetteer() if global_conf["LOCAL_ENTITY_EXTRACTION"] else None
+)
+intent_classifier = load_intent_classifier()
+
+
+@dataclass
+class EntityResults:
+    """Pokémon API information and RAG descriptions gathered by the asynchronous
+    pipeline, mapped by Pokémon name. Handlers sharing an instance (the queries of a
+    batch) request each Pokémon only once.
+    Attributes:
+        pokemon_info (Dict[str, Any]): Pokémon information from the API (Stage 2).
+        pokemon_descriptions (Dict[str, Any]): Pokémon descriptions from the RAG
+        agent (Stage 3).
+    """
+
+    pokemon_info: Dict[str, Any] = field(default_factory=dict)
+    pokemon_descriptions: Dict[str, Any] = field(default_factory=dict)
+
+
 @dataclass
 class IntentHandler:
     """Class to handle the intent of the user input and route it to the corresponding
@@ -33,15 +89,42 @@ class IntentHandler:
         entities. Defaults to get_pokemon_entity_chain.
         intent_chain (RunnableSequence, optional): Chain to tag the intent type and
         structure. Defaults to get_intent_chain.
+        intent_entity_chain (RunnableSequence, optional): Chain to tag the intent type
+        and structure, and gather the Pokémon entities in a single call. Used when
+        `FUSED_INTENT_ENTITY_CHAIN` is enabled. Defaults to get_intent_entity_chain.
         no_intent_chain (RunnableSequence, optional): Chain to handle the case where no
         intent is found. Defaults to get_no_intent_chain.
         user_input (str, optional): User input. Defaults to "".
+        entity_results (EntityResults, optional): Pokémon information and
+        descriptions already gathered, shared by the handlers of a batch. Defaults to
+        an empty EntityResults.
     Other agents (non-attributes):
         QA Agents (RunnableParallel): used to collect information and suggestions
         based on a method, however internally a RunnableParallel is used to perform
         tasks in parallel (context retrieval).
         API Agents (RunnableParallel): Used to collect information from an API using
         a tool selection method using RunnableSequence.
+    Execution:
+        `run` executes the pipeline synchronously, while `arun` executes the same
+        pipeline with the asynchronous methods of the chains and tools, so it can be
+        awaited from the API without blocking the event loop. `astream` executes the
+        asynchronous pipeline and yields the response as streaming events (header,
+        Pokémon cards and RAG answer tokens) as soon as each part is ready.
+        `abatch` executes the asynchronous pipeline for many user inputs, with the
+        LLM calls of Stage 0 and 1 batched, and the API information and descriptions
+        of each Pokémon gathered once for the whole batch.
+        When `SPECULATIVE_ENTITY_EXTRACTION` is enabled, the Pokémon entities of the
+        user input are extracted in parallel with the Stage 0 tagging, and the result
+        is only discarded by the branches that don't need it. When
+        `FUSED_INTENT_ENTITY_CHAIN` is enabled, both are obtained from a single
+        structured call instead.
+        When `LOCAL_INTENT_CLASSIFIER` is enabled, Stage 0 is answered by the local
+        `IntentClassifier` when its confidence reaches `INTENT_CLASSIFIER_THRESHOLD`,
+        and by the LLM tagger otherwise.
+        When `LOCAL_ENTITY_EXTRACTION` is enabled, the Pokémon names of the user input
+        are first matched against the local Pokédex names (`PokemonGazetteer`), and the
+        LLM is only used to extract them when nothing is matched, or from the answer
+        of the `natural_language_description` structure.
     """
 
     response_template: ResponseTemplate = field(default_factory=ResponseTemplate)
@@ -49,14 +132,239 @@ class IntentHandler:
         default_factory=get_pokemon_entity_chain
     )
     intent_chain: RunnableSequence = field(default_factory=get_intent_chain)
+    intent_entity_chain: RunnableSequence = field(
+        default_factory=get_intent_entity_chain
+    )
     no_intent_chain: RunnableSequence = field(default_factory=get_no_intent_chain)
     user_input: str = field(default_factory=str)
+    entity_results: EntityResults = field(default_factory=EntityResults)
+    _prefetched_entities: Optional[PokemonEntityList] = field(
+        default=None, init=False, repr=False
+    )
+    _local_entities: Optional[PokemonEntityList] = field(
+        default=None, init=False, repr=False
+    )
+
+    def _match_local_entities(self) -> None:
+        """Match the Pokémon names of the user input without the LLM, an empty match
+        is not kept so the LLM chains are used as fallback."""
+        if pokemon_gazetteer is None:
+            return
+        local_entities = pokemon_gazetteer.extract(self.user_input)
+        if local_entities.name_list:
+            self._local_entities = local_entities
+
+    def _get_speculative_chain(self) -> RunnableParallel:
+        """Create a chain that tags the intent and extracts the Pokémon entities at the
+        same time. A failure of the entity extraction must not break the tagging, so
+        it is logged and falls back to `None`, and the entities are extracted again
+        when required.
+        Returns:
+            RunnableParallel: Tagging and extraction chains executed in parallel.
+        """
+        return RunnableParallel(
+            intent=self.intent_chain,
+            entities=self.pokemon_entity_chain.with_fallbacks(
+                [RunnableLambda(self._skip_speculative_entities)],
+                exception_key="exception",
+            ),
+        )
+
+    @staticmethod
+    def _skip_speculative_entities(inputs: Dict[str, Any]) -> None:
+        """Log the failure of the speculative entity extraction.
+        Args:
+            inputs (Dict[str, Any]): Chain input, with the raised `exception`.
+        """
+        logger.warning(
+            "Speculative entity extraction failed, the entities will be extracted "
+            f"again if required: {inputs['exception']!r}"
+        )
+
+    def _set_fused_entities(self, output: IntentEntityTagger) -> None:
+        """Keep the entities returned by the fused chain for the next stages. An empty
+        list is not kept, so the dedicated entity chain is still used as fallback.
+        Args:
+            output (IntentEntityTagger): Output of the fused chain.
+        """
+        if output.name_list:
+            self._prefetched_entities = PokemonEntityList(name_list=output.name_list)
+
+    def _classify_intent(self) -> Optional[IntentTagger]:
+        """Tag the intent with the local classifier when it is confident enough.
+        Returns:
+            Optional[IntentTagger]: Intent type and structure, or None if the LLM
+            tagger must be used.
+        """
+        if intent_classifier is None:
+            return None
+        prediction, confidence = intent_classifier.predict(self.user_input)
+        if confidence < global_conf["INTENT_CLASSIFIER_THRESHOLD"]:
+            logger.info(f"Intent classifier confidence {confidence:.2f}, using LLM")
+            return None
+        return prediction
+
+    @traced("tagging")
+    def _tag_intent(self) -> IntentTagger:
+        """Tag the intent type and structure of the user input.
+        Returns:
+            IntentTagger: Intent type and structure.
+        """
+        self._match_local_entities()
+        local_intent = self._classify_intent()
+        if local_intent is not None:
+            return local_intent
+
+        if global_conf["FUSED_INTENT_ENTITY_CHAIN"]:
+            output = self.intent_entity_chain.invoke({"input": self.user_input})
+            self._set_fused_entities(output)
+            return output
+
+        if global_conf["SPECULATIVE_ENTITY_EXTRACTION"] and not self._local_entities:
+            output = self._get_speculative_chain().invoke({"input": self.user_input})
+            self._prefetched_entities = output["entities"]
+            return output["intent"]
+
+        return self.intent_chain.invoke({"input": self.user_input})
+
+    @traced("tagging")
+    async def _atag_intent(self) -> IntentTagger:
+        """Asynchronous version of `_tag_intent`.
+        Returns:
+            IntentTagger: Intent type and structure.
+        """
+        self._match_local_entities()
+        local_intent = self._classify_intent()
+        if local_intent is not None:
+            return local_intent
+
+        if global_conf["FUSED_INTENT_ENTITY_CHAIN"]:
+            output = await self.intent_entity_chain.ainvoke({"input": self.user_input})
+            self._set_fused_entities(output)
+            return output
+
+        if global_conf["SPECULATIVE_ENTITY_EXTRACTION"] and not self._local_entities:
+            output = await self._get_speculative_chain().ainvoke(
+                {"input": self.user_input}
+            )
+            self._prefetched_entities = output["entities"]
+            return output["intent"]
+
+        return await self.intent_chain.ainvoke({"input": self.user_input})
+
+    def _pop_prefetched_entities(self, text: str) -> Optional[PokemonEntityList]:
+        """Return the entities extracted ahead of time when they belong to `text`,
+        the ones matched locally take precedence over the ones extracted by the LLM.
+        Args:
+            text (str): Text to extract the Pokémon entities from.
+        Returns:
+            Optional[PokemonEntityList]: Pokémon entities, if they were prefetched.
+        """
+        if text != self.user_input:
+            return None
+
+        if (
+            self._local_entities is not None
+            and self.response_template.intent_structure
+            != "natural_language_description"
+        ):
+            return self._local_entities
+
+        if self._prefetched_entities is None:
+            return None
+
+        prefetched_entities, self._prefetched_entities = self._prefetched_entities, None
+        return prefetched_entities
+
+    @traced("entity_extraction")
+    def _extract_entities(self, text: str) -> PokemonEntityList:
+        """Gather the Pokémon entities mentioned in a text.
+        Args:
+            text (str): Text to extract the Pokémon entities from.
+        Returns:
+            PokemonEntityList: Pokémon entities.
+        """
+        prefetched_entities = self._pop_prefetched_entities(text)
+        if prefetched_entities is not None:
+            return prefetched_entities
+
+        return self.pokemon_entity_chain.invoke({"input": text})
+
+    @traced("entity_extraction")
+    async def _aextract_entities(self, text: str) -> PokemonEntityList:
+        """Asynchronous version of `_extract_entities`.
+        Args:
+            text (str): Text to extract the Pokémon entities from.
+        Returns:
+            PokemonEntityList: Pokémon entities.
+        """
+        prefetched_entities = self._pop_prefetched_entities(text)
+        if prefetched_entities is not None:
+            return prefetched_entities
+
+        return await self.pokemon_entity_chain.ainvoke({"input": text})
+
+    async def _aget_pokemon_info(
+        self, pokemon_entity_list: PokemonEntityList
+    ) -> Dict[str, Any]:
+        """Gather the API information of the Pokémon, only the ones missing from
+        `entity_results` are requested.
+        Args:
+            pokemon_entity_list (PokemonEntityList): Pokémon entities.
+        Returns:
+            Dict[str, Any]: Pokémon information mapped by name, in the order of the
+            entities.
+        """
+        pokemon_names = list(
+            dict.fromkeys(
+                str(pokemon.name) for pokemon in pokemon_entity_list.name_list
+            )
+        )
+        pokemon_info = self.entity_results.pokemon_info
+        missing = [name for name in pokemon_names if name not in pokemon_info]
+        if missing:
+            pokemon_info.update(
+                await aapi_retrieval_agent(
+                    pokemon_entity_list=PokemonEntityList(
+                        name_list=[PokemonEntity(name=name) for name in missing]
+                    ),
+                    prompt="stage_2_information_api_search_template",
+                )
+            )
+        return {
+            name: pokemon_info[name] for name in pokemon_names if name in pokemon_info
+        }
+
+    async def _aget_pokemon_descriptions(
+        self, pokemon_list: List[PokemonEntity]
+    ) -> Dict[str, Any]:
+        """Gather the RAG descriptions of the Pokémon, only the ones missing from
+        `entity_results` are requested.
+        Args:
+            pokemon_list (List[PokemonEntity]): Pokémon entities.
+        Returns:
+            Dict[str, Any]: Pokémon descriptions mapped by name, in the order of the
+            entities.
+        """
+        pokemon_names = list(
+            dict.fromkeys(str(pokemon.name) for pokemon in pokemon_list)
+        )
+        descriptions = self.entity_results.pokemon_descriptions
+        missing = [name for name in pokemon_names if name not in descriptions]
+        if missing:
+            descriptions.update(
+                await aretrieval_qa_agent(
+                    user_query="stage_3_query_template",
+                    qa_prompt="stage_3_retrieval_qa_template",
+                    pokemon_list=[PokemonEntity(name=name) for name in missing],
+                )
+            )
+        return {name: descriptions[name] for name in pokemon_names}
 
     def run(self) -> ResponseTemplate:
         logger.info("Stage 0: `Tagging` intent type and structure")
-        intent_chain = self.intent_chain
         try:
-            intent_chain_output = intent_chain.invoke({"input": self.user_input})
+            intent_chain_output = self._tag_intent()
             assert intent_chain_output.intent_type is not None, "No intent found"
         except AssertionError as e:
             logger.error(f"Error: {e}")
@@ -96,10 +404,7 @@ class IntentHandler:
             try:
                 logger.info("Sub Branch 1.1: Routing `pokemon name` structure")
                 # 1.1.1. Gather Pokémon entity
-                pokemon_entity_chain = self.pokemon_entity_chain
-                pokemon_entities_output = pokemon_entity_chain.invoke(
-                    {"input": self.user_input}
-                )
+                pokemon_entities_output = self._extract_entities(self.user_input)
                 assert pokemon_entities_output.name_list, "No Pokémon entity found"
                 # 1.1.2. Append API info
                 pokemon_info = api_retrieval_agent(
@@ -126,15 +431,11 @@ class IntentHandler:
                     "Sub Branch 1.2: Routing `natural language question` structure"
                 )
                 # 1.2.1. Gather direct answer from QA
-                qa_chain = _get_retrieval_qa_chain(
-                    qa_prompt="stage_3_retrieval_qa_template"
+                answer = qa_agent(
+                    query=self.user_input, qa_prompt="stage_3_retrieval_qa_template"
                 )
-                answer = qa_chain.invoke(self.user_input)
                 # 1.2.2. Gather Pokémon entity
-                pokemon_entity_chain = self.pokemon_entity_chain
-                pokemon_entities_output = pokemon_entity_chain.invoke(
-                    {"input": self.user_input}
-                )
+                pokemon_entities_output = self._extract_entities(self.user_input)
                 assert pokemon_entities_output.name_list, "No Pokémon entity found"
                 # 1.2.3. Append API info
                 pokemon_info = api_retrieval_agent(
@@ -156,14 +457,12 @@ class IntentHandler:
                     "Sub Branch 1.3: Routing `natural language description` structure"
                 )
                 # 1.3.1. Gather direct answer from QA
-                qa_chain = _get_retrieval_qa_chain(
-                    qa_prompt="stage_3_retrieval_qa_template"
+                answer = qa_agent(
+                    query=self.user_input, qa_prompt="stage_3_retrieval_qa_template"
                 )
-                answer = qa_chain.invoke(self.user_input)
                 assert answer["answer"] != "None", "No answer found"
                 # 1.3.2. Gather Pokémon entity
-                pokemon_entity_chain = self.pokemon_entity_chain
-                pokemon_entities_output = pokemon_entity_chain.invoke({"input": answer})
+                pokemon_entities_output = self._extract_entities(answer)
                 assert pokemon_entities_output.name_list, "No Pokémon entity found"
                 # 1.3.3. Append API info
                 pokemon_info = api_retrieval_agent(
@@ -191,10 +490,7 @@ class IntentHandler:
         """
         try:
             # 2.1. Gather Pokémon entity
-            opponent_pokemon_entity_chain = self.pokemon_entity_chain
-            opponent_pokemon_entities_output = opponent_pokemon_entity_chain.invoke(
-                {"input": self.user_input}
-            )
+            opponent_pokemon_entities_output = self._extract_entities(self.user_input)
             assert opponent_pokemon_entities_output.name_list, "No Pokémon entity found"
 
             # 2.2. Append API info
@@ -233,10 +529,7 @@ class IntentHandler:
         """
         try:
             # 3.1. Gather Pokémon entity
-            opponent_pokemon_entity_chain = self.pokemon_entity_chain
-            opponent_pokemon_entities_output = opponent_pokemon_entity_chain.invoke(
-                {"input": self.user_input}
-            )
+            opponent_pokemon_entities_output = self._extract_entities(self.user_input)
             assert opponent_pokemon_entities_output.name_list, "No Pokémon entity found"
             # 3.2. Append API info
             opponent_pokemon_info = api_retrieval_agent(
@@ -281,3 +574,536 @@ class IntentHandler:
             self.response_template.error = True
 
         return self.response_template
+
+    async def arun(self) -> ResponseTemplate:
+        """Asynchronous version of `run`, every LLM and API call is awaited so other
+        requests can be served while this one is waiting.
+        Returns:
+            ResponseTemplate: Response template.
+        """
+        logger.info("Stage 0: `Tagging` intent type and structure")
+        try:
+            intent_chain_output = await self._atag_intent()
+            assert intent_chain_output.intent_type is not None, "No intent found"
+        except AssertionError as e:
+            logger.error(f"Error: {e}")
+            self.response_template.error = True
+            return self.response_template
+
+        return await self._aroute_intent(intent_chain_output)
+
+    async def _aroute_intent(
+        self, intent_chain_output: IntentTagger
+    ) -> ResponseTemplate:
+        """Route the tagged intent to the asynchronous handler of its branch.
+        Args:
+            intent_chain_output (IntentTagger): Intent type and structure.
+        Returns:
+            ResponseTemplate: Response template.
+        """
+        self.response_template.intent_type = intent_chain_output.intent_type
+        self.response_template.intent_structure = intent_chain_output.intent_structure
+
+        if intent_chain_output.intent_type == "information_request":
+            logger.info("Branch 1: Routing `information request` intent")
+            return await self.ahandle_information_intent(
+                structure=intent_chain_output.intent_structure
+            )
+
+        elif intent_chain_output.intent_type == "defense_suggestion":
+            logger.info("Branch 2: Routing `defense suggestion` intent")
+            return await self.ahandle_defense_intent()
+
+        elif intent_chain_output.intent_type == "squad_build":
+            logger.info("Branch 3: Routing `squad builder` intent")
+            return await self.ahandle_squad_build_intent()
+
+        else:
+            logger.error(f"No intent found: {intent_chain_output.intent_type}")
+            self.response_template.no_intent = True
+            return await self.ahandle_no_intent()
+
+    async def ahandle_information_intent(self, structure: str) -> ResponseTemplate:
+        """Asynchronous version of `handle_information_intent`.
+        Args:
+            structure (str): Intent textual structure.
+        Returns:
+            ResponseTemplate: Response template.
+        """
+        if structure == "pokemon_names":
+            try:
+                logger.info("Sub Branch 1.1: Routing `pokemon name` structure")
+                # 1.1.1. Gather Pokémon entity
+                pokemon_entities_output = await self._aextract_entities(
+                    self.user_input
+                )
+                assert pokemon_entities_output.name_list, "No Pokémon entity found"
+                # 1.1.2. Append API info & 1.1.3. Pokémon Description (Semantic Search)
+                pokemon_info, pokemon_descriptions = await asyncio.gather(
+                    self._aget_pokemon_info(
+                        pokemon_entity_list=pokemon_entities_output
+                    ),
+                    self._aget_pokemon_descriptions(
+                        pokemon_list=pokemon_entities_output.name_list
+                    ),
+                )
+                self.response_template.pokemon_info = pokemon_info
+                self.response_template.pokemon_descriptions = pokemon_descriptions
+            except AssertionError as e:
+                logger.error(f"Error: {e}")
+                self.response_template.error = True
+
+            return self.response_template
+
+        elif structure == "natural_language_question":
+            try:
+                logger.info(
+                    "Sub Branch 1.2: Routing `natural language question` structure"
+                )
+                # 1.2.1. Gather direct answer from QA & 1.2.2. Gather Pokémon entity
+                answer, pokemon_entities_output = await asyncio.gather(
+                    aqa_agent(
+                        query=self.user_input,
+                        qa_prompt="stage_3_retrieval_qa_template",
+                    ),
+                    self._aextract_entities(self.user_input),
+                )
+                assert pokemon_entities_output.name_list, "No Pokémon entity found"
+                # 1.2.3. Append API info
+                pokemon_info = await self._aget_pokemon_info(
+                    pokemon_entity_list=pokemon_entities_output
+                )
+                self.response_template.nlp_answer = answer
+                self.response_template.pokemon_info = pokemon_info
+            except AssertionError as e:
+                logger.error(f"Error: {e}")
+                self.response_template.error = True
+
+            return self.response_template
+
+        elif structure == "natural_language_description":
+            # NOTE: This section requires wiki with descriptions
+            try:
+                logger.info(
+                    "Sub Branch 1.3: Routing `natural language description` structure"
+                )
+                # 1.3.1. Gather direct answer from QA
+                answer = await aqa_agent(
+                    query=self.user_input, qa_prompt="stage_3_retrieval_qa_template"
+                )
+                assert answer["answer"] != "None", "No answer found"
+                # 1.3.2. Gather Pokémon entity
+                pokemon_entities_output = await self._aextract_entities(answer)
+                assert pokemon_entities_output.name_list, "No Pokémon entity found"
+                # 1.3.3. Append API info
+                pokemon_info = await self._aget_pokemon_info(
+                    pokemon_entity_list=pokemon_entities_output
+                )
+                self.response_template.nlp_answer = answer
+                self.response_template.pokemon_info = pokemon_info
+            except AssertionError as e:
+                logger.error(f"Error: {e}")
+                self.response_template.error = True
+
+            return self.response_template
+
+        else:
+            logger.info("No intent structure found")
+            self.response_template.no_intent = True
+
+            return self.response_template
+
+    async def ahandle_defense_intent(self) -> ResponseTemplate:
+        """Asynchronous version of `handle_defense_intent`.
+        Returns:
+            ResponseTemplate: Response template.
+        """
+        try:
+            # 2.1. Gather Pokémon entity
+            opponent_pokemon_entities_output = await self._aextract_entities(
+                self.user_input
+            )
+            assert opponent_pokemon_entities_output.name_list, "No Pokémon entity found"
+
+            # 2.2. Append API info
+            opponent_pokemon_info = await self._aget_pokemon_info(
+                pokemon_entity_list=opponent_pokemon_entities_output
+            )
+            # 2.3. Append Pokémon Defense Suggestion (Semantic Search)
+            pokemon_defense_suggestion = await adefensive_qa_agent(
+                user_query="stage_4_defensive_recommendation_template",
+                qa_prompt="stage_3_retrieval_qa_template",
+                pokemon_info=opponent_pokemon_info,
+                pokemon_list=opponent_pokemon_entities_output.name_list,
+            )
+            # 2.4. Gather Pokémon entity from API
+            pokemon_defense_list = [
+                PokemonEntity(name=value["answer"])
+                for key, value in pokemon_defense_suggestion.items()
+                if value["answer"] != "None"
+            ]
+            pokemon_defense_info = await self._aget_pokemon_info(
+                pokemon_entity_list=PokemonEntityList(name_list=pokemon_defense_list)
+            )
+            self.response_template.pokemon_defense_info = pokemon_defense_info
+        except AssertionError as e:
+            logger.error(f"Error: {e}")
+            self.response_template.error = True
+
+        return self.response_template
+
+    async def ahandle_squad_build_intent(self) -> ResponseTemplate:
+        """Asynchronous version of `handle_squad_build_intent`.
+        Returns:
+            ResponseTemplate: Response template.
+        """
+        try:
+            # 3.1. Gather Pokémon entity
+            opponent_pokemon_entities_output = await self._aextract_entities(
+                self.user_input
+            )
+            assert opponent_pokemon_entities_output.name_list, "No Pokémon entity found"
+            # 3.2. Append API info
+            opponent_pokemon_info = await self._aget_pokemon_info(
+                pokemon_entity_list=opponent_pokemon_entities_output
+            )
+            # 3.3. Append Pokémon Defense Suggestion (Semantic Search)
+            pokemon_defense_suggestion = await adefensive_qa_agent(
+                user_query="stage_4_defensive_recommendation_template",
+                qa_prompt="stage_3_retrieval_qa_template",
+                pokemon_info=opponent_pokemon_info,
+                pokemon_list=opponent_pokemon_entities_output.name_list,
+            )
+            # 3.4. Gather Pokémon entity from API
+            pokemon_squad_list = [
+                PokemonEntity(name=value["answer"])
+                for key, value in pokemon_defense_suggestion.items()
+                if value["answer"] != "None"
+            ]
+            pokemon_squad_info = await self._aget_pokemon_info(
+                pokemon_entity_list=PokemonEntityList(name_list=pokemon_squad_list)
+            )
+            self.response_template.pokemon_squad_info = pokemon_squad_info
+        except AssertionError as e:
+            logger.error(f"Error: {e}")
+            self.response_template.error = True
+
+        return self.response_template
+
+    async def ahandle_no_intent(self) -> ResponseTemplate:
+        """Asynchronous version of `handle_no_intent`.
+        Returns:
+            ResponseTemplate: Response template.
+        """
+        try:
+            no_intent_chain = self.no_intent_chain
+            intent_chain_output = await no_intent_chain.ainvoke(
+                {"input": self.user_input}
+            )
+            self.response_template.nlp_answer = intent_chain_output
+        except AssertionError as e:
+            logger.error(f"Error: {e}")
+            self.response_template.error = True
+
+        return self.response_template
+
+    @staticmethod
+    async def _adrain(
+        queue: asyncio.Queue, producers: List[Coroutine]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the events put in the queue by the producers while they run
+        concurrently, until all of them have finished.
+        Args:
+            queue (asyncio.Queue): Queue the producers put their events in.
+            producers (List[Coroutine]): Producers to run.
+        Returns:
+            AsyncIterator[Dict[str, Any]]: Events, in the order they are produced.
+        """
+        tasks = asyncio.gather(*producers)
+        tasks.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while (event := await queue.get()) is not None:
+                yield event
+            await tasks  # Raise the error of a failed producer
+        finally:
+            tasks.cancel()  # The client is gone, stop the pending calls
+
+    async def _astream_descriptions(self) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming version of Sub Branch 1.1 (`pokemon_names` structure), the cards
+        are sent as soon as the API info is ready, and the descriptions of every
+        Pokémon are streamed concurrently token by token into their cards.
+        Returns:
+            AsyncIterator[Dict[str, Any]]: Streaming events.
+        """
+        # 1.1.1. Gather Pokémon entity
+        pokemon_entities_output = await self._aextract_entities(self.user_input)
+        if not pokemon_entities_output.name_list:
+            logger.error("Error: No Pokémon entity found")
+            self.response_template.error = True
+            return
+        yield dict(event="header", data=self.response_template.initial_header())
+
+        pokemon_names = [
+            str(pokemon.name) for pokemon in pokemon_entities_output.name_list
+        ]
+        descriptions = {pokemon: "" for pokemon in pokemon_names}
+        card_indexes: Dict[str, int] = {}  # A Pokémon missing from the API has no card
+        cards_sent = asyncio.Event()
+        queue = asyncio.Queue()
+
+        async def send_cards():
+            # 1.1.2. Append API info
+            try:
+                pokemon_info = await self._aget_pokemon_info(
+                    pokemon_entity_list=pokemon_entities_output
+                )
+                self.response_template.pokemon_info = pokemon_info
+                for index, (name, pokemon) in enumerate(pokemon_info.items()):
+                    card = ResponseTemplate.card(name, pokemon)
+                    queue.put_nowait(dict(event="card", index=index, data=card))
+                    card_indexes[name] = index
+            finally:
+                cards_sent.set()
+
+        async def send_description(pokemon: str, query: str):
+            # 1.1.3. Pokémon Description (Semantic Search), the tokens generated
+            # before the cards are sent are buffered, then sent to the card
+            sent = 0
+
+            def send_pending():
+                nonlocal sent
+                if pokemon in card_indexes and sent < len(descriptions[pokemon]):
+                    token = descriptions[pokemon][sent:]
+                    index = card_indexes[pokemon]
+                    queue.put_nowait(dict(event="token", index=index, data=token))
+                    sent = len(descriptions[pokemon])
+
+            async for token in astream_retrieval_qa_agent(
+                query=query,
+                qa_prompt="stage_3_retrieval_qa_template",
+                name_lookup=True,
+            ):
+                descriptions[pokemon] += token
+                if cards_sent.is_set():
+                    send_pending()
+            await cards_sent.wait()
+            send_pending()
+
+        queries = _get_pokemon_queries("stage_3_query_template", pokemon_names)
+        producers = [send_cards()] + [
+            send_description(pokemon, query)
+            for pokemon, query in zip(pokemon_names, queries)
+        ]
+        async for event in self._adrain(queue, producers):
+            yield event
+
+        self.response_template.pokemon_descriptions = {
+            pokemon: {"answer": answer} for pokemon, answer in descriptions.items()
+        }
+
+    async def _astream_question(self) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming version of Sub Branch 1.2 (`natural_language_question`
+        structure), the answer is streamed token by token as the header while the
+        Pokémon entities are extracted, then the cards are sent.
+        Returns:
+            AsyncIterator[Dict[str, Any]]: Streaming events.
+        """
+        answer, extracted = "", {}
+        queue = asyncio.Queue()
+
+        async def send_answer():
+            # 1.2.1. Gather direct answer from QA
+            nonlocal answer
+            async for token in astream_retrieval_qa_agent(
+                query=self.user_input, qa_prompt="stage_3_retrieval_qa_template"
+            ):
+                answer += token
+                queue.put_nowait(dict(event="token", index=None, data=token))
+
+        async def extract_entities():
+            # 1.2.2. Gather Pokémon entity
+            extracted["entities"] = await self._aextract_entities(self.user_input)
+
+        async for event in self._adrain(queue, [send_answer(), extract_entities()]):
+            yield event
+
+        self.response_template.nlp_answer = {"answer": answer}
+        pokemon_entities_output = extracted["entities"]
+        if not pokemon_entities_output.name_list:
+            logger.error("Error: No Pokémon entity found")
+            self.response_template.error = True
+            return
+        # 1.2.3. Append API info
+        pokemon_info = await self._aget_pokemon_info(
+            pokemon_entity_list=pokemon_entities_output
+        )
+        self.response_template.pokemon_info = pokemon_info
+        for index, (name, pokemon) in enumerate(pokemon_info.items()):
+            card = ResponseTemplate.card(name, pokemon)
+            yield dict(event="card", index=index, data=card)
+
+    async def astream(self) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming version of `arun`, the response is yielded as events so the
+        client can render it before the whole pipeline has finished:
+        - `header`: header of the response (replaces the current one).
+        - `token`: token of a RAG answer, appended to the card at `index`, or to the
+        header when `index` is None.
+        - `card`: Pokémon card (name, body and sprites) at `index`.
+        - `done`: complete response, as returned by `/intent_query/`.
+        Sub Branches 1.1 and 1.2 are streamed, the rest of the branches send their
+        response once complete (their RAG answers are Pokémon names, not text).
+        Returns:
+            AsyncIterator[Dict[str, Any]]: Streaming events.
+        """
+        logger.info("Stage 0: `Tagging` intent type and structure")
+        intent_chain_output = await self._atag_intent()
+        streamed_branches = {
+            "pokemon_names": self._astream_descriptions,
+            "natural_language_question": self._astream_question,
+        }
+
+        if intent_chain_output.intent_type is None:
+            logger.error("Error: No intent found")
+            self.response_template.error = True
+
+        elif (
+            intent_chain_output.intent_type == "information_request"
+            and intent_chain_output.intent_structure in streamed_branches
+        ):
+            logger.info("Branch 1: Streaming `information request` intent")
+            self.response_template.intent_type = intent_chain_output.intent_type
+            self.response_template.intent_structure = (
+                intent_chain_output.intent_structure
+            )
+            stream_branch = streamed_branches[intent_chain_output.intent_structure]
+            async for event in stream_branch():
+                yield event
+
+            response = self.response_template.template_structure
+            if self.response_template.error:  # Replace what was already sent
+                yield dict(event="header", data=response["header"])
+            yield dict(event="done", data=response)
+            return
+
+        else:
+            await self._aroute_intent(intent_chain_output)
+
+        for event in ResponseTemplate.events(self.response_template.template_structure):
+            yield event
+
+    def _needs_user_entities(self, intent: IntentTagger) -> bool:
+        """Whether the branch of the intent extracts the Pokémon entities of the user
+        input (`natural_language_description` extracts them from the RAG answer).
+        Args:
+            intent (IntentTagger): Intent type and structure.
+        Returns:
+            bool: True if the user input entities are required.
+        """
+        if intent.intent_type == "information_request":
+            return intent.intent_structure in [
+                "pokemon_names",
+                "natural_language_question",
+            ]
+        return intent.intent_type in ["defense_suggestion", "squad_build"]
+
+    @classmethod
+    async def abatch(cls, user_inputs: List[str]) -> List[ResponseTemplate]:
+        """Execute the asynchronous pipeline for many user inputs. Stage 0 and the
+        entity extraction are sent as batched LLM calls, then the API information
+        and the descriptions of every distinct Pokémon of the batch are gathered once
+        and shared by the handlers, before routing each input to its branch. A
+        failed input is answered with the error template and doesn't fail the batch.
+        Args:
+            user_inputs (List[str]): User inputs.
+        Returns:
+            List[ResponseTemplate]: Response templates, in the order of the inputs.
+        """
+        if not user_inputs:
+            return []
+        config = {"max_concurrency": global_conf["BATCH_MAX_CONCURRENCY"]}
+        first = cls(user_input=user_inputs[0])
+        handlers = [first] + [  # The chains and results are shared by the batch
+            replace(first, user_input=user_input, response_template=ResponseTemplate())
+            for user_input in user_inputs[1:]
+        ]
+
+        logger.info(f"Stage 0: `Tagging` intent type and structure of {len(handlers)}")
+        intents: List[Optional[IntentTagger]] = []
+        for handler in handlers:
+            handler._match_local_entities()
+            intents.append(handler._classify_intent())
+        pending = [i for i, intent in enumerate(intents) if intent is None]
+        fused = global_conf["FUSED_INTENT_ENTITY_CHAIN"]
+        tagging_chain = first.intent_entity_chain if fused else first.intent_chain
+        with span("batch_tagging"):
+            outputs = await tagging_chain.abatch(
+                [{"input": handlers[i].user_input} for i in pending],
+                config=config,
+                return_exceptions=True,
+            )
+        for i, output in zip(pending, outputs):
+            if isinstance(output, Exception):
+                logger.error(f"Error: {output}")
+                continue
+            if fused:
+                handlers[i]._set_fused_entities(output)
+            intents[i] = output
+
+        logger.info("Stage 1: Gathering the Pokémon entities of the batch")
+        tagged = [
+            i
+            for i, intent in enumerate(intents)
+            if intent is not None and handlers[i]._needs_user_entities(intent)
+        ]
+        pending = [
+            i
+            for i in tagged
+            if handlers[i]._local_entities is None
+            and handlers[i]._prefetched_entities is None
+        ]
+        with span("batch_entity_extraction"):
+            outputs = await first.pokemon_entity_chain.abatch(
+                [{"input": handlers[i].user_input} for i in pending],
+                config=config,
+                return_exceptions=True,
+            )
+        for i, output in zip(pending, outputs):
+            if not isinstance(output, Exception):  # Extracted again by the branch
+                handlers[i]._prefetched_entities = output
+
+        logger.info("Stage 2 & 3: Gathering the distinct Pokémon of the batch")
+        info_entities, description_entities = [], []
+        for i in tagged:
+            entities = handlers[i]._local_entities or handlers[i]._prefetched_entities
+            if entities is None:
+                continue
+            info_entities.extend(entities.name_list)
+            if intents[i].intent_structure == "pokemon_names":
+                description_entities.extend(entities.name_list)
+        # A failure is not cached, the queries of the failed Pokémon request them
+        # again from their branch
+        outputs = await asyncio.gather(
+            first._aget_pokemon_info(PokemonEntityList(name_list=info_entities)),
+            first._aget_pokemon_descriptions(description_entities),
+            return_exceptions=True,
+        )
+        for output in outputs:
+            if isinstance(output, Exception):
+                logger.error(f"Error: {output}")
+
+        semaphore = asyncio.Semaphore(global_conf["BATCH_MAX_CONCURRENCY"])
+
+        async def route(handler: IntentHandler, intent: Optional[IntentTagger]):
+            if intent is None or intent.intent_type is None:
+                logger.error("Error: No intent found")
+                handler.response_template.error = True
+                return
+            async with semaphore:
+                try:
+                    await handler._aroute_intent(intent)
+                except Exception as e:
+                    logger.error(f"Error: {e}")
+                    handler.response_template.error = True
+
+        await asyncio.gather(*map(route, handlers, intents))
+        return [handler.response_template for handler in handlers]
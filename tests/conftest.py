@@ -0,0 +1,5 @@
+import os
+
+# The modules create the `SetupLoader` on import, which builds the OpenAI chat model
+# (no request is sent by the tests)
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
@@ -0,0 +1,77 @@
+import pytest
+from langchain_core.documents import Document
+from retrieval_system import context_packer
+from retrieval_system.context_packer import pack_context
+
+# Words of a page without repeated spans, so the overlaps are unambiguous (3 words
+# make the shortest overlap merged, `MIN_OVERLAP`)
+WORDS = [f"word{i:03d}" for i in range(60)]
+
+
+def text(start: int, end: int) -> str:
+    return " ".join(WORDS[start:end])
+
+
+def chunk(start: int, end: int, page: int = 1) -> Document:
+    return Document(
+        page_content=text(start, end), metadata={"source": "pokedex.pdf", "page": page}
+    )
+
+
+def test_contained_chunk_is_dropped():
+    assert pack_context([chunk(0, 25), chunk(5, 15)]) == text(0, 25)
+
+
+def test_containing_chunk_replaces_the_section():
+    assert pack_context([chunk(5, 15), chunk(0, 25)]) == text(0, 25)
+
+
+@pytest.mark.parametrize("order", [(0, 1), (1, 0)])
+def test_overlapping_chunks_are_merged_in_both_directions(order):
+    chunks = [chunk(0, 12), chunk(9, 21)]
+
+    assert pack_context([chunks[i] for i in order]) == text(0, 21)
+
+
+def test_chunk_bridging_two_sections_merges_them():
+    docs = [chunk(0, 12), chunk(20, 32), chunk(9, 23)]
+
+    assert pack_context(docs) == text(0, 32)
+
+
+def test_short_overlap_is_not_merged():
+    docs = [chunk(0, 12), chunk(10, 22)]  # 2 words in common
+
+    assert pack_context(docs) == f"{text(0, 12)}\n\n{text(10, 22)}"
+
+
+def test_chunks_of_different_pages_are_never_merged():
+    docs = [chunk(0, 12, page=1), chunk(9, 21, page=2)]
+
+    assert pack_context(docs) == f"{text(0, 12)}\n\n{text(9, 21)}"
+
+
+def test_context_is_trimmed_at_the_token_budget(monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(context_packer.tiktoken, "encoding_for_model", unavailable)
+    monkeypatch.setattr(context_packer.tiktoken, "get_encoding", unavailable)
+    context_packer._get_encoding.cache_clear()
+    docs = [chunk(0, 5, page=1), chunk(0, 5, page=2), chunk(0, 5, page=3)]
+
+    try:
+        encoding = context_packer._get_encoding("offline")
+        # 10 tokens of 4 characters per section and 1 per separator: 25 - 11 - 11
+        context = pack_context(docs, max_tokens=25, model="offline")
+    finally:
+        context_packer._get_encoding.cache_clear()
+
+    assert isinstance(encoding, context_packer._ApproximateEncoding)
+    assert context == f"{text(0, 5)}\n\n{text(0, 5)}\n\n{text(0, 5)[:12]}"
+
+
+def test_no_budget_keeps_every_section():
+    docs = [chunk(0, 5, page=1), chunk(0, 5, page=2)]
+
+    assert pack_context(docs) == f"{text(0, 5)}\n\n{text(0, 5)}"
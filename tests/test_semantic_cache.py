@@ -0,0 +1,44 @@
+from typing import Iterable, List
+from langchain_core.embeddings import Embeddings
+from src.common.semantic_cache import SemanticCache
+
+POKEMON_NAMES = ("pikachu", "raichu")
+
+
+class ConstantEmbeddings(Embeddings):
+    """Embeddings mapping every text to the same vector, like two queries that only
+    differ by the Pokémon named."""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [1.0, 0.0, 0.0]
+
+
+def extract_names(query: str) -> Iterable[str]:
+    """Known Pokémon names in the query."""
+    return [word for word in query.lower().split() if word in POKEMON_NAMES]
+
+
+def test_queries_naming_other_pokemon_are_not_served():
+    cache = SemanticCache(embeddings=ConstantEmbeddings(), extract_names=extract_names)
+    key, cached_response = cache.lookup("Tell me about Pikachu")
+    assert cached_response is None
+    cache.add(key, {"header": "Pikachu"})
+
+    _, cached_response = cache.lookup("Tell me about Raichu")
+
+    assert cached_response is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_paraphrases_naming_the_same_pokemon_are_served():
+    cache = SemanticCache(embeddings=ConstantEmbeddings(), extract_names=extract_names)
+    key, _ = cache.lookup("Tell me about Pikachu")
+    cache.add(key, {"header": "Pikachu"})
+
+    _, cached_response = cache.lookup("Pikachu info please")
+
+    assert cached_response == {"header": "Pikachu"}
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,90 @@
+import numpy as np
+from tools.type_chart import (
+    TYPE_INDEX,
+    TYPES,
+    bulk_damage_relations,
+    damage_relations,
+    defensive_multipliers,
+    offensive_multipliers,
+    relations_from_multipliers,
+)
+
+# Keys of the `damage_relations` of the PokeAPI `type` resource
+POKEAPI_RELATIONS = {
+    "double_damage_from",
+    "double_damage_to",
+    "half_damage_from",
+    "half_damage_to",
+    "no_damage_from",
+    "no_damage_to",
+}
+
+
+def test_dual_type_weakness_is_multiplied():
+    multipliers = defensive_multipliers(["fire", "flying"])
+
+    assert multipliers[TYPE_INDEX["rock"]] == 4
+    assert multipliers[TYPE_INDEX["ground"]] == 0
+    assert multipliers[TYPE_INDEX["grass"]] == 0.25
+
+
+def test_immunities():
+    assert defensive_multipliers(["normal"])[TYPE_INDEX["ghost"]] == 0
+    assert defensive_multipliers(["ghost"])[TYPE_INDEX["normal"]] == 0
+    assert defensive_multipliers(["fairy"])[TYPE_INDEX["dragon"]] == 0
+    assert defensive_multipliers(["steel"])[TYPE_INDEX["poison"]] == 0
+
+
+def test_offense_uses_the_most_effective_type():
+    multipliers = offensive_multipliers(["electric", "flying"])
+
+    assert multipliers[TYPE_INDEX["water"]] == 2  # electric
+    assert multipliers[TYPE_INDEX["ground"]] == 1  # flying, electric has no effect
+    assert multipliers[TYPE_INDEX["grass"]] == 2  # flying
+
+
+def test_single_type_matches_the_pokeapi_relations():
+    relations = damage_relations(["fire"])
+
+    assert set(relations["double_damage_from"]) == {"water", "ground", "rock"}
+    assert set(relations["double_damage_to"]) == {"grass", "ice", "bug", "steel"}
+    assert set(relations["half_damage_to"]) == {"fire", "water", "rock", "dragon"}
+    assert set(relations["half_damage_from"]) == {
+        "fire",
+        "grass",
+        "ice",
+        "bug",
+        "steel",
+        "fairy",
+    }
+    assert "no_damage_from" not in relations
+
+
+def test_relations_have_the_pokeapi_shape():
+    for types in (["normal"], ["fire", "flying"], ["ghost", "dark"], ["shadow"]):
+        relations = damage_relations(types)
+
+        assert set(relations) <= POKEAPI_RELATIONS
+        for type_names in relations.values():
+            assert type_names and all(name in TYPES for name in type_names)
+
+
+def test_relations_are_sorted_from_the_strongest_effect():
+    relations = damage_relations(["bug", "steel"])
+
+    assert relations["double_damage_from"] == ["fire"]
+    assert relations["half_damage_from"][0] == "grass"  # 0.25x before 0.5x
+
+
+def test_relations_from_multipliers_skips_neutral_types():
+    neutral = np.ones(len(TYPES), dtype=np.float32)
+
+    assert relations_from_multipliers(neutral, neutral) == {}
+
+
+def test_bulk_relations_match_single_pokemon():
+    types_list = [["fire", "flying"], ["water"], ["ghost", "dark"], []]
+
+    assert bulk_damage_relations(types_list) == [
+        damage_relations(types) for types in types_list
+    ]
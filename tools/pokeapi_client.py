@@ -0,0 +1,355 @@
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+import httpx
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from setup_loader import SetupLoader
+
+app_setup = SetupLoader()
+logger, global_conf = app_setup.logger, app_setup.global_conf
+
+
+def normalize_name(name: str) -> str:
+    """Normalize a Pokémon name to the PokeAPI naming convention.
+    (e.g. 'Mr. Mime' -> 'mr-mime', "Farfetch'd" -> 'farfetchd', 'Nidoran♀' ->
+    'nidoran-f')
+    Args:
+        name (str): Name as written by the user or the LLM.
+    Returns:
+        str: Normalized name.
+    """
+    name = name.strip().lower().replace("♀", "-f").replace("♂", "-m")
+    name = re.sub(r"[.'’:]", "", name)
+    return re.sub(r"[\s_]+", "-", name)
+
+
+def parse_pokemon(pokemon_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the Pokémon information used by the application from the raw PokeAPI
+    `pokemon` resource.
+    Args:
+        pokemon_data (Dict[str, Any]): Raw JSON of the `pokemon` resource.
+    Returns:
+        Dict[str, Any]: Pokémon information (id, stats, height, weight, types,
+        abilities and sprites).
+    """
+    return {
+        "id": pokemon_data["id"],
+        "stats": {
+            stat["stat"]["name"]: stat["base_stat"] for stat in pokemon_data["stats"]
+        },
+        "height": pokemon_data["height"],
+        "weight": pokemon_data["weight"],
+        "types": [type_slot["type"]["name"] for type_slot in pokemon_data["types"]],
+        "abilities": [
+            ability_slot["ability"]["name"]
+            for ability_slot in pokemon_data["abilities"]
+        ],
+        # Only the flat sprites, nested ones ('other', 'versions') are not displayed
+        "sprites": {
+            key: value
+            for key, value in pokemon_data["sprites"].items()
+            if not isinstance(value, dict)
+        },
+    }
+
+
+class TTLCache:
+    """Bounded in-memory cache with time-to-live and least recently used eviction.
+    Attributes:
+        maxsize (int): Maximum number of entries.
+        ttl (float): Seconds an entry is valid.
+        hits (int): Number of lookups served by the cache.
+        misses (int): Number of lookups not served by the cache.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Read an entry, expired entries are handled as misses.
+        Args:
+            key (str): Entry key.
+        Returns:
+            Optional[Any]: Cached value, or None on miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        """Write an entry, evicting the least recently used one when full.
+        Args:
+            key (str): Entry key.
+            value (Any): Value to cache.
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Cache counters.
+        Returns:
+            Dict[str, int]: Hits, misses and current size.
+        """
+        with self._lock:
+            size = len(self._entries)
+        return {"hits": self.hits, "misses": self.misses, "size": size}
+
+
+class DiskCache:
+    """On-disk cache tier stored in SQLite, so responses survive restarts.
+    Attributes:
+        path (str): Path of the SQLite database.
+        ttl (float): Seconds an entry is valid.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        """Read an entry, expired entries are handled as misses.
+        Args:
+            key (str): Entry key.
+        Returns:
+            Optional[Any]: Cached value, or None on miss.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any) -> None:
+        """Write an entry.
+        Args:
+            key (str): Entry key.
+            value (Any): JSON serializable value to cache.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) "
+                "VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + self.ttl),
+            )
+
+
+class PokeAPIClient:
+    """Long-lived PokeAPI client shared by every request. HTTP connections are pooled
+    and the parsed `pokemon` resources are cached by normalized name, in memory
+    (TTL + LRU) and optionally on disk (`POKEAPI_CACHE_DISK_PATH`).
+    An asynchronous client can only be used from the event loop it was created in,
+    so one is kept per loop (dropped with its loop) and `aclose` must be awaited
+    before the loop stops (e.g. on app shutdown) to release its connections.
+    """
+
+    def __init__(self):
+        self.base_url = global_conf["POKEAPI_BASE_URL"]
+        self.limits = httpx.Limits(
+            max_connections=global_conf["POKEAPI_MAX_CONNECTIONS"],
+            max_keepalive_connections=global_conf["POKEAPI_MAX_CONNECTIONS"],
+        )
+        self.cache = TTLCache(
+            maxsize=global_conf["POKEAPI_CACHE_SIZE"],
+            ttl=global_conf["POKEAPI_CACHE_TTL"],
+        )
+        self.disk_cache = (
+            DiskCache(
+                path=global_conf["POKEAPI_CACHE_DISK_PATH"],
+                ttl=global_conf["POKEAPI_CACHE_TTL"],
+            )
+            if global_conf.get("POKEAPI_CACHE_DISK_PATH")
+            else None
+        )
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._async_clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, httpx.AsyncClient
+        ] = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self) -> httpx.Client:
+        """Pooled HTTP client, created on first use (once, even when the tool threads
+        request it at the same time)."""
+        client = self._client
+        if client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = httpx.Client(
+                        timeout=global_conf["POKEAPI_TIMEOUT"], limits=self.limits
+                    )
+                client = self._client
+        return client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """Pooled asynchronous HTTP client of the running event loop, created on
+        first use."""
+        loop = asyncio.get_running_loop()
+        async_client = self._async_clients.get(loop)
+        if async_client is None:
+            async_client = httpx.AsyncClient(
+                timeout=global_conf["POKEAPI_TIMEOUT"], limits=self.limits
+            )
+            self._async_clients[loop] = async_client
+        return async_client
+
+    async def aclose(self) -> None:
+        """Close the asynchronous client of the running event loop and the pooled
+        synchronous client, they are created again on next use."""
+        async_client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if async_client is not None:
+            await async_client.aclose()
+        with self._client_lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    def _cache_get(self, key: str) -> Optional[Any]:
+        """Read the memory tier, then the disk tier (promoting hits to memory)."""
+        value = self.cache.get(key)
+        if value is None and self.disk_cache is not None:
+            value = self.disk_cache.get(key)
+            if value is not None:
+                self.cache.set(key, value)
+        return value
+
+    def _cache_set(self, key: str, value: Any) -> None:
+        """Write both cache tiers."""
+        self.cache.set(key, value)
+        if self.disk_cache is not None:
+            self.disk_cache.set(key, value)
+
+    def _url(self, resource: str, name: str) -> str:
+        return f"{self.base_url}/{resource}/{name}"
+
+    def get_pokemon(self, name: str) -> Dict[str, Any]:
+        """Request the information of a Pokémon.
+        Args:
+            name (str): Pokémon name.
+        Returns:
+            Dict[str, Any]: Pokémon information, see `parse_pokemon`.
+        """
+        key = f"pokemon:{normalize_name(name)}"
+        info = self._cache_get(key)
+        if info is None:
+            response = self.client.get(self._url("pokemon", normalize_name(name)))
+            response.raise_for_status()
+            info = parse_pokemon(response.json())
+            self._cache_set(key, info)
+        return dict(info)
+
+    async def aget_pokemon(self, name: str) -> Dict[str, Any]:
+        """Asynchronous version of `get_pokemon`."""
+        key = f"pokemon:{normalize_name(name)}"
+        info = self._cache_get(key)
+        if info is None:
+            response = await self.async_client.get(
+                self._url("pokemon", normalize_name(name))
+            )
+            response.raise_for_status()
+            info = parse_pokemon(response.json())
+            self._cache_set(key, info)
+        return dict(info)
+
+    def clear_cache(self) -> None:
+        """Empty the in-memory cache, the disk tier is kept."""
+        self.cache.clear()
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Counters of the in-memory cache.
+        Returns:
+            Dict[str, int]: Hits, misses and current size.
+        """
+        return self.cache.stats()
+
+
+class FixturePokeAPIClient:
+    """Offline stand-in of `PokeAPIClient` (`POKEAPI_BACKEND: "fixture"`), it serves
+    the Pokémon of a local stand-in JSON file (same format accepted by
+    `make import_pokedex`), so the pipeline can run without network.
+    Attributes:
+        path (str): Path of the stand-in JSON file with the `pokemon` list.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "r") as file:
+            self.pokemon = {
+                normalize_name(pokemon_data["name"]): parse_pokemon(pokemon_data)
+                for pokemon_data in json.load(file)["pokemon"]
+            }
+        self.hits = 0
+        self.misses = 0
+
+    def get_pokemon(self, name: str) -> Dict[str, Any]:
+        """Read the information of a Pokémon.
+        Args:
+            name (str): Pokémon name.
+        Returns:
+            Dict[str, Any]: Pokémon information, see `parse_pokemon`.
+        """
+        info = self.pokemon.get(normalize_name(name))
+        if info is None:
+            self.misses += 1
+            raise LookupError(f"'{name}' is not in the PokeAPI fixture '{self.path}'")
+        self.hits += 1
+        return dict(info)
+
+    async def aget_pokemon(self, name: str) -> Dict[str, Any]:
+        """Asynchronous version of `get_pokemon`."""
+        return self.get_pokemon(name)
+
+    async def aclose(self) -> None:
+        """Nothing to release, for compatibility with `PokeAPIClient`."""
+
+    def clear_cache(self) -> None:
+        """Reset the counters, the fixture is not a cache."""
+        self.hits = self.misses = 0
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Counters of the fixture lookups.
+        Returns:
+            Dict[str, int]: Hits, misses and number of Pokémon in the fixture.
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.pokemon)}
+
+
+pokeapi_client = (
+    FixturePokeAPIClient(path=global_conf["POKEAPI_FIXTURE_PATH"])
+    if global_conf["POKEAPI_BACKEND"] == "fixture"
+    else PokeAPIClient()
+)
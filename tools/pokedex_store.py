@@ -0,0 +1,143 @@
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import threading
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from tools.pokeapi_client import parse_pokemon
+from tools.type_chart import bulk_damage_relations
+from setup_loader import SetupLoader
+
+app_setup = SetupLoader()
+logger, global_conf = app_setup.logger, app_setup.global_conf
+
+
+class PokedexStore:
+    """Local Pokédex stored in SQLite, it keeps the same information extracted by the
+    `pokemon_api_wrapper` tool (id, stats, height, weight, types, abilities, sprites
+    and damage relations) so Pokémon can be served without requesting the PokeAPI.
+    Attributes:
+        path (str): Path of the SQLite database. Defaults to `POKEDEX_STORE_PATH`.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or global_conf["POKEDEX_STORE_PATH"]
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open the database once, reading an absent store is handled as a miss.
+        Returns:
+            Optional[sqlite3.Connection]: Connection, or None if the store is absent.
+        """
+        if self._connection is None and os.path.exists(self.path):
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        return self._connection
+
+    def get_pokemon(self, name: str) -> Optional[Dict[str, Any]]:
+        """Read the information of a Pokémon.
+        Args:
+            name (str): Pokémon name, as used by the PokeAPI (lowercase).
+        Returns:
+            Optional[Dict[str, Any]]: Pokémon information, or None if not stored.
+        """
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return None
+            row = connection.execute(
+                "SELECT info FROM pokemon WHERE name = ?", (name,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def names(self) -> List[str]:
+        """List the names of the stored Pokémon.
+        Returns:
+            List[str]: Pokémon names ordered by id.
+        """
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return []
+            rows = connection.execute("SELECT name FROM pokemon ORDER BY id").fetchall()
+        return [row[0] for row in rows]
+
+    def bulk_import(self, entries: Iterator[Tuple[str, Dict[str, Any]]]) -> int:
+        """Create the store if required and insert (or replace) Pokémon entries.
+        Args:
+            entries (Iterator[Tuple[str, Dict[str, Any]]]): Pokémon names and their
+            information.
+        Returns:
+            int: Number of Pokémon imported.
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS pokemon "
+                "(name TEXT PRIMARY KEY, id INTEGER NOT NULL, info TEXT NOT NULL)"
+            )
+            with connection:
+                cursor = connection.executemany(
+                    "INSERT OR REPLACE INTO pokemon (name, id, info) VALUES (?, ?, ?)",
+                    (
+                        (name, info["id"], json.dumps(info))
+                        for name, info in entries
+                    ),
+                )
+            if self._connection is not None:
+                self._connection.close()
+            self._connection = connection
+        return cursor.rowcount
+
+
+def _read_source(source: str) -> Iterator[Dict]:
+    """Read the raw `pokemon` resources from a PokeAPI dump.
+    Args:
+        source (str): Either a folder with the PokeAPI `api-data` layout
+        (`<source>/pokemon/<id>/index.json`), or a local stand-in JSON file with the
+        `pokemon` list.
+    Returns:
+        Iterator[Dict]: Raw `pokemon` resources.
+    """
+    if os.path.isfile(source):
+        with open(source, "r") as file:
+            yield from json.load(file)["pokemon"]
+        return
+
+    for path in glob.glob(os.path.join(source, "pokemon", "*", "index.json")):
+        with open(path, "r") as file:
+            yield json.load(file)
+
+
+def _build_entries(
+    source: str, batch_size: int = 1000
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Parse every Pokémon of the dump and compute its damage relations from the
+    type-effectiveness chart, vectorized over batches of Pokémon.
+    Args:
+        source (str): PokeAPI dump, see `_read_source`.
+        batch_size (int, optional): Pokémon per vectorized batch. Defaults to 1000.
+    Returns:
+        Iterator[Tuple[str, Dict[str, Any]]]: Pokémon names and their information.
+    """
+    pokemon_resources = _read_source(source)
+    while batch := list(islice(pokemon_resources, batch_size)):
+        infos = [parse_pokemon(pokemon_data) for pokemon_data in batch]
+        relations = bulk_damage_relations([info["types"] for info in infos])
+        for pokemon_data, info, damage_relations in zip(batch, infos, relations):
+            info["damage_relations"] = damage_relations
+            yield pokemon_data["name"], info
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a PokeAPI dump")
+    parser.add_argument("--source", required=True, help="PokeAPI dump to import")
+    parser.add_argument("--path", default=None, help="SQLite store to fill")
+    args = parser.parse_args()
+
+    logger.info(f"Importing Pokédex from '{args.source}'")
+    imported = PokedexStore(path=args.path).bulk_import(_build_entries(args.source))
+    logger.info(f"Pokédex store ready: {imported} Pokémon imported")
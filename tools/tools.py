@@ -1,64 +1,118 @@
-import pokepy
-from typing import Dict, List
-from langchain.tools import tool
-from langchain_core.tools import ToolException
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Union
+from langchain_core.tools import StructuredTool, ToolException
 from parsers.tooling_output_parser import ToolingEntry
+from tools.pokeapi_client import normalize_name, pokeapi_client
+from tools.pokedex_store import PokedexStore
+from tools.type_chart import damage_relations
 from setup_loader import SetupLoader
 
 app_setup = SetupLoader()
-base_llm, logger = app_setup.chat_openai, app_setup.logger
+base_llm, logger, global_conf = (
+    app_setup.chat_openai,
+    app_setup.logger,
+    app_setup.global_conf,
+)
 
+pokedex_store = PokedexStore()
 
-@tool("pokemon_api_wrapper", args_schema=ToolingEntry, return_direct=True)
-def pokemon_api_wrapper(name_list: List[str]) -> Dict:
+
+def _read_pokedex_store(pokemon_name: str) -> Optional[Dict]:
+    """Read a Pokémon from the local Pokédex store.
+    Args:
+        pokemon_name (str): Pokémon name.
+    Returns:
+        Optional[Dict]: Pokémon information, or None if it must be requested to the
+        PokeAPI.
+    """
+    info = pokedex_store.get_pokemon(normalize_name(pokemon_name))
+    if info is None and not global_conf["POKEAPI_NETWORK_FALLBACK"]:
+        raise LookupError(f"'{pokemon_name}' is not in the local Pokédex store")
+    return info
+
+
+def _get_pokemon_info(pokemon_name: str) -> Dict:
+    """Read a Pokémon from the local Pokédex store, or request it to the PokeAPI.
+    Damage relations are computed locally from the type-effectiveness chart.
+    Args:
+        pokemon_name (str): Pokémon name.
+    Returns:
+        Dict: Pokémon information.
+    """
+    info = _read_pokedex_store(pokemon_name)
+    if info is None:
+        logger.info(" PokemonAPIWrapper: Information Search ")
+        info = pokeapi_client.get_pokemon(pokemon_name)
+        info["damage_relations"] = damage_relations(info["types"])
+    return info
+
+
+async def _aget_pokemon_info(pokemon_name: str) -> Dict:
+    """Asynchronous version of `_get_pokemon_info`."""
+    info = _read_pokedex_store(pokemon_name)
+    if info is None:
+        logger.info(" PokemonAPIWrapper: Information Search ")
+        info = await pokeapi_client.aget_pokemon(pokemon_name)
+        info["damage_relations"] = damage_relations(info["types"])
+    return info
+
+
+def _collect_pokemon_info(
+    name_list: List[str], results: List[Union[Dict, BaseException]]
+) -> Dict:
+    """Map each requested name to its information, raising the first error found in
+    the order of the request.
+    Args:
+        name_list (List[str]): Distinct Pokémon names, in request order.
+        results (List[Union[Dict, BaseException]]): Information or error per name.
+    Returns:
+        Dict: Pokémon information mapped by name.
+    """
+    pokemon_info_collection = {}
+    for pokemon_name, result in zip(name_list, results):
+        if isinstance(result, BaseException):
+            raise ToolException(f"Tool Error handling '{pokemon_name}': {result}")
+        pokemon_info_collection[pokemon_name] = result
+        logger.info(
+            f" PokemonAPIWrapper: Information of '{pokemon_name}' was extracted "
+        )
+    return pokemon_info_collection
+
+
+def _pokemon_api_wrapper(name_list: List[str]) -> Dict:
     """Useful for when you need to request information from the Pokémon API,
     considering a single Pokémon Entity or several of them as input."""
-    client = pokepy.V2Client()
-    pokemon_info_collection = {}
+    name_list = list(dict.fromkeys(name_list))
 
-    for pokemon_name in name_list:
-        try:
-            logger.info(" PokemonAPIWrapper: Information Search ")
-            pokemon_data = client.get_pokemon(pokemon_name.lower())
-            pokemon = pokemon_data[0]
-            info = {
-                "id": pokemon.id,
-                "stats": {stat.stat.name: stat.base_stat for stat in pokemon.stats},
-                "height": pokemon.height,
-                "weight": pokemon.weight,
-                "types": [type_slot.type.name for type_slot in pokemon.types],
-                "abilities": [
-                    ability_slot.ability.name for ability_slot in pokemon.abilities
-                ],
-                "sprites": pokemon.sprites.__dict__,
-            }
-
-            logger.info(" PokemonAPIWrapper: Types Search ")
-            if info["types"]:
-                try:
-                    # Extract Damage Relations
-                    info["damage_relations"] = [
-                        client.get_type(type_slot) for type_slot in info["types"]
-                    ]
-                    # Overwrite Damage Relations
-                    damage_relations = info["damage_relations"][0][0].damage_relations
-                    info["damage_relations"] = {
-                        damage_type: damage_relations.__dict__.get(damage_type)[0].name
-                        for damage_type in damage_relations.__dict__.keys()
-                        if damage_type != "_subresource_map"
-                        and damage_relations.__dict__.get(damage_type) != []
-                    }
-                except Exception as e:
-                    logger.info(f"No 'damage_relations' were extracted: {e}")
-                    info["damage_relations"] = {}
-                    pass
-
-            pokemon_info_collection[pokemon_name] = info
-            logger.info(
-                f" PokemonAPIWrapper: Information of '{pokemon_name}' was extracted "
-            )
-
-        except Exception as e:
-            raise ToolException(f"Tool Error handling '{pokemon_name}': {e}")
+    with ThreadPoolExecutor(max_workers=global_conf["POKEAPI_MAX_WORKERS"]) as pool:
+        futures = [pool.submit(_get_pokemon_info, name) for name in name_list]
+        results = [future.exception() or future.result() for future in futures]
 
-    return pokemon_info_collection
+    return _collect_pokemon_info(name_list, results)
+
+
+async def _apokemon_api_wrapper(name_list: List[str]) -> Dict:
+    """Asynchronous version of `_pokemon_api_wrapper`, the PokeAPI is requested with
+    an asynchronous HTTP client so the event loop is never blocked."""
+    name_list = list(dict.fromkeys(name_list))
+    semaphore = asyncio.Semaphore(global_conf["POKEAPI_MAX_WORKERS"])
+
+    async def bounded(pokemon_name: str) -> Dict:
+        async with semaphore:
+            return await _aget_pokemon_info(pokemon_name)
+
+    results = await asyncio.gather(
+        *[bounded(name) for name in name_list], return_exceptions=True
+    )
+
+    return _collect_pokemon_info(name_list, results)
+
+
+pokemon_api_wrapper = StructuredTool.from_function(
+    func=_pokemon_api_wrapper,
+    coroutine=_apokemon_api_wrapper,
+    name="pokemon_api_wrapper",
+    args_schema=ToolingEntry,
+    return_direct=True,
+)
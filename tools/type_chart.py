@@ -0,0 +1,227 @@
+import numpy as np
+from typing import Dict, List, Sequence
+
+# Order of the rows (attacking type) and columns (defending type) of the chart
+TYPES = [
+    "normal",
+    "fire",
+    "water",
+    "electric",
+    "grass",
+    "ice",
+    "fighting",
+    "poison",
+    "ground",
+    "flying",
+    "psychic",
+    "bug",
+    "rock",
+    "ghost",
+    "dragon",
+    "dark",
+    "steel",
+    "fairy",
+]
+TYPE_INDEX = {type_name: index for index, type_name in enumerate(TYPES)}
+
+# Attacking type -> (super effective, not very effective, no effect) defending types
+_TYPE_RELATIONS = {
+    "normal": ([], ["rock", "steel"], ["ghost"]),
+    "fire": (
+        ["grass", "ice", "bug", "steel"],
+        ["fire", "water", "rock", "dragon"],
+        [],
+    ),
+    "water": (["fire", "ground", "rock"], ["water", "grass", "dragon"], []),
+    "electric": (["water", "flying"], ["electric", "grass", "dragon"], ["ground"]),
+    "grass": (
+        ["water", "ground", "rock"],
+        ["fire", "grass", "poison", "flying", "bug", "dragon", "steel"],
+        [],
+    ),
+    "ice": (
+        ["grass", "ground", "flying", "dragon"],
+        ["fire", "water", "ice", "steel"],
+        [],
+    ),
+    "fighting": (
+        ["normal", "ice", "rock", "dark", "steel"],
+        ["poison", "flying", "psychic", "bug", "fairy"],
+        ["ghost"],
+    ),
+    "poison": (["grass", "fairy"], ["poison", "ground", "rock", "ghost"], ["steel"]),
+    "ground": (
+        ["fire", "electric", "poison", "rock", "steel"],
+        ["grass", "bug"],
+        ["flying"],
+    ),
+    "flying": (["grass", "fighting", "bug"], ["electric", "rock", "steel"], []),
+    "psychic": (["fighting", "poison"], ["psychic", "steel"], ["dark"]),
+    "bug": (
+        ["grass", "psychic", "dark"],
+        ["fire", "fighting", "poison", "flying", "ghost", "steel", "fairy"],
+        [],
+    ),
+    "rock": (
+        ["fire", "ice", "flying", "bug"],
+        ["fighting", "ground", "steel"],
+        [],
+    ),
+    "ghost": (["psychic", "ghost"], ["dark"], ["normal"]),
+    "dragon": (["dragon"], ["steel"], ["fairy"]),
+    "dark": (["psychic", "ghost"], ["fighting", "dark", "fairy"], []),
+    "steel": (["ice", "rock", "fairy"], ["fire", "water", "electric", "steel"], []),
+    "fairy": (["fighting", "dragon", "dark"], ["fire", "poison", "steel"], []),
+}
+
+
+def _build_effectiveness_matrix() -> np.ndarray:
+    """Build the 18x18 type-effectiveness matrix.
+    Returns:
+        np.ndarray: Damage multiplier of the attacking type (row) against the
+        defending type (column).
+    """
+    matrix = np.ones((len(TYPES), len(TYPES)), dtype=np.float32)
+    for attacker, relations in _TYPE_RELATIONS.items():
+        for multiplier, defenders in zip((2.0, 0.5, 0.0), relations):
+            for defender in defenders:
+                matrix[TYPE_INDEX[attacker], TYPE_INDEX[defender]] = multiplier
+    return matrix
+
+
+EFFECTIVENESS = _build_effectiveness_matrix()
+EFFECTIVENESS.setflags(write=False)
+
+# Both sides of the chart with an extra row used as "no second type", neutral for
+# the product of the defending side and for the max of the attacking side
+_NO_TYPE = len(TYPES)
+_DEFENSE_PADDED = np.vstack([EFFECTIVENESS.T, np.ones(len(TYPES), np.float32)])
+_OFFENSE_PADDED = np.vstack([EFFECTIVENESS, np.zeros(len(TYPES), np.float32)])
+
+
+def _type_indices(types: Sequence[str]) -> List[int]:
+    """Indices of the known types (unknown ones such as 'shadow' are ignored)."""
+    return [TYPE_INDEX[t] for t in types if t in TYPE_INDEX]
+
+
+def defensive_multipliers(types: Sequence[str]) -> np.ndarray:
+    """Combined multiplier of every attacking type against a Pokémon with the given
+    types, computed as the product of the chart columns.
+    Args:
+        types (Sequence[str]): Types of the defending Pokémon.
+    Returns:
+        np.ndarray: Multiplier per attacking type, shape (18,).
+    """
+    return EFFECTIVENESS[:, _type_indices(types)].prod(axis=1)
+
+
+def offensive_multipliers(types: Sequence[str]) -> np.ndarray:
+    """Best multiplier a Pokémon with the given types deals to every defending type,
+    using the most effective of its own types (max of the chart rows).
+    Args:
+        types (Sequence[str]): Types of the attacking Pokémon.
+    Returns:
+        np.ndarray: Multiplier per defending type, shape (18,).
+    """
+    indices = _type_indices(types)
+    if not indices:
+        return np.ones(len(TYPES), dtype=np.float32)
+    return EFFECTIVENESS[indices, :].max(axis=0)
+
+
+def _bulk_type_pairs(types_list: Sequence[Sequence[str]]) -> np.ndarray:
+    """Indices of the (up to two) types of each Pokémon, padded with `_NO_TYPE`.
+    Args:
+        types_list (Sequence[Sequence[str]]): Types of each Pokémon.
+    Returns:
+        np.ndarray: Type indices, shape (N, 2).
+    """
+    pairs = np.full((len(types_list), 2), _NO_TYPE, dtype=np.intp)
+    for row, types in enumerate(types_list):
+        indices = _type_indices(types)[:2]
+        pairs[row, : len(indices)] = indices
+    return pairs
+
+
+def bulk_defensive_multipliers(types_list: Sequence[Sequence[str]]) -> np.ndarray:
+    """Vectorized `defensive_multipliers` for many Pokémon at once (e.g. the whole
+    Pokédex), each Pokémon has one or two types.
+    Args:
+        types_list (Sequence[Sequence[str]]): Types of each defending Pokémon.
+    Returns:
+        np.ndarray: Multiplier per Pokémon and attacking type, shape (N, 18).
+    """
+    pairs = _bulk_type_pairs(types_list)
+    return _DEFENSE_PADDED[pairs[:, 0]] * _DEFENSE_PADDED[pairs[:, 1]]
+
+
+def bulk_offensive_multipliers(types_list: Sequence[Sequence[str]]) -> np.ndarray:
+    """Vectorized `offensive_multipliers` for many Pokémon at once.
+    Args:
+        types_list (Sequence[Sequence[str]]): Types of each attacking Pokémon.
+    Returns:
+        np.ndarray: Multiplier per Pokémon and defending type, shape (N, 18).
+    """
+    pairs = _bulk_type_pairs(types_list)
+    multipliers = np.maximum(_OFFENSE_PADDED[pairs[:, 0]], _OFFENSE_PADDED[pairs[:, 1]])
+    multipliers[pairs[:, 0] == _NO_TYPE] = 1.0  # Pokémon without known types
+    return multipliers
+
+
+def bulk_damage_relations(
+    types_list: Sequence[Sequence[str]],
+) -> List[Dict[str, List[str]]]:
+    """Vectorized `damage_relations` for many Pokémon at once.
+    Args:
+        types_list (Sequence[Sequence[str]]): Types of each Pokémon.
+    Returns:
+        List[Dict[str, List[str]]]: Damage relations of each Pokémon.
+    """
+    defensive = bulk_defensive_multipliers(types_list)
+    offensive = bulk_offensive_multipliers(types_list)
+    return [
+        relations_from_multipliers(defensive[row], offensive[row])
+        for row in range(len(types_list))
+    ]
+
+
+def relations_from_multipliers(
+    defensive: np.ndarray, offensive: np.ndarray
+) -> Dict[str, List[str]]:
+    """Translate multiplier vectors into the damage relations used by the
+    application, each relation lists its types from the strongest effect.
+    Args:
+        defensive (np.ndarray): Multiplier per attacking type, shape (18,).
+        offensive (np.ndarray): Multiplier per defending type, shape (18,).
+    Returns:
+        Dict[str, List[str]]: Damage relation name mapped to its type names.
+    """
+
+    def select(multipliers: np.ndarray, mask: np.ndarray, descending: bool) -> List:
+        indices = np.flatnonzero(mask)
+        keys = -multipliers[indices] if descending else multipliers[indices]
+        return [TYPES[i] for i in indices[np.argsort(keys, kind="stable")]]
+
+    relations = {
+        "double_damage_from": select(defensive, defensive > 1, descending=True),
+        "double_damage_to": select(offensive, offensive > 1, descending=True),
+        "half_damage_from": select(
+            defensive, (defensive < 1) & (defensive > 0), descending=False
+        ),
+        "half_damage_to": select(offensive, (offensive < 1) & (offensive > 0), False),
+        "no_damage_from": select(defensive, defensive == 0, descending=False),
+        "no_damage_to": select(offensive, offensive == 0, descending=False),
+    }
+    return {relation: types for relation, types in relations.items() if types}
+
+
+def damage_relations(types: Sequence[str]) -> Dict[str, List[str]]:
+    """Damage relations of a Pokémon, considering all of its types.
+    Args:
+        types (Sequence[str]): Types of the Pokémon.
+    Returns:
+        Dict[str, List[str]]: Damage relation name mapped to its type names.
+    """
+    return relations_from_multipliers(
+        defensive_multipliers(types), offensive_multipliers(types)
+    )